@@ -1,49 +1,2574 @@
 # app.py
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, g, request, jsonify, render_template_string, stream_with_context
 from flask_cors import CORS
-import csv, io, time
-import spacy
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import atexit, bisect, cProfile, csv, gzip, io, json, os, pstats, queue, shutil, sqlite3, sys, tempfile, threading, time, uuid, zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from array import array
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timezone
 
-app = Flask(_name_)
+app = Flask(__name__)
 CORS(app)
 
 # -------------------------
 # Models & In-memory stores
 # -------------------------
-nlp = spacy.load("en_core_web_sm")
-embed_model = SentenceTransformer('all-MiniLM-L6-v2')
+class LazyModel:
+    """Loads a model on first use (once, thread-safe) and records load/warm-up state."""
 
-semantic_search_data = []  # list of triple dicts: {subject,relation,object,...}
+    def __init__(self, name, loader, warm):
+        self.name = name
+        self._loader = loader
+        self._warm = warm
+        self._model = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"  # not_loaded -> loading -> loaded | failed
+        self.load_time_s = None
+        self.warm = False
+        self.warm_time_s = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self.state = "loading"
+                    t0 = time.time()
+                    try:
+                        self._model = self._loader()
+                    except Exception as e:
+                        self.state, self.error = "failed", str(e)
+                        raise
+                    self.load_time_s = round(time.time() - t0, 3)
+                    self.state = "loaded"
+        return self._model
+
+    def warm_up(self):
+        """Load the model and run one dummy call so the first real request is fast."""
+        model = self.get()
+        if not self.warm:
+            t0 = time.time()
+            self._warm(model)
+            self.warm_time_s = round(time.time() - t0, 3)
+            self.warm = True
+        return model
+
+    def status(self):
+        return {"state": self.state, "load_time_s": self.load_time_s, "warm": self.warm,
+                "warm_time_s": self.warm_time_s, "error": self.error}
+
+class RWLock:
+    """Reader/writer lock: many concurrent readers or one writer.
+
+    Waiting writers block new readers so ingest cannot starve. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+def _load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "torch")  # torch | onnx
+EMBED_MODEL_NAME = os.environ.get("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBED_QUANTIZE = os.environ.get("EMBED_QUANTIZE", "")  # "int8": dynamically quantised ONNX weights
+EMBED_THREADS = int(os.environ.get("EMBED_THREADS", 0))  # ONNX intra-op threads, 0 = runtime default
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "kmap-models"))
+
+def onnx_model_dir(model_name=EMBED_MODEL_NAME):
+    return os.environ.get("EMBED_ONNX_DIR") or os.path.join(MODEL_CACHE_DIR, model_name.replace("/", "__") + "-onnx")
+
+def encoder_signature(backend=EMBED_BACKEND, model_name=EMBED_MODEL_NAME, quantize=EMBED_QUANTIZE):
+    """Identifies the embedding space; vectors from different signatures must not be mixed."""
+    return f"{backend}:{model_name}" + (f":{quantize}" if backend == "onnx" and quantize else "")
+
+class SentenceTransformerEncoder:
+    """The PyTorch sentence-transformers model (downloaded to the Hugging Face cache on first use)."""
+    backend = "torch"
+
+    def __init__(self, model_name=EMBED_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, cache_folder=os.environ.get("MODEL_CACHE_DIR"))
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+class OnnxEncoder:
+    """ONNX Runtime on CPU over a directory written by export_onnx().
+
+    Reads only local files (model.onnx or model-int8.onnx, tokenizer.json,
+    encoder.json), so it never touches the network and needs neither torch nor
+    sentence-transformers. Pooling follows the exported model's
+    sentence-transformers config; rows are L2-normalised like the torch path.
+    """
+    backend = "onnx"
+
+    def __init__(self, model_dir, quantize=EMBED_QUANTIZE, threads=EMBED_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        path = os.path.join(model_dir, "model-int8.onnx" if quantize == "int8" else "model.onnx")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run `python Knowledge_mapping_using_ai.py export-onnx` "
+                                    "where the model can be downloaded and copy the directory here")
+        with open(os.path.join(model_dir, "encoder.json")) as fh:
+            self.config = json.load(fh)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config.get("max_length", 256))
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_id", 0))
+        self.dim = self.config.get("dim")
+
+    def encode(self, texts):
+        encoded = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        if self.config.get("pooling", "mean") == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+def export_onnx(model_name=EMBED_MODEL_NAME, out_dir=None, quantize=True, opset=17):
+    """Export the sentence-transformers model's transformer to ONNX (plus an int8 copy).
+
+    Needs torch, sentence-transformers and onnxruntime, and network access the
+    first time the model is fetched; the written directory is self-contained.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    out_dir = out_dir or onnx_model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, tokenizer = model[0].auto_model.eval(), model.tokenizer
+    pooling = next((m for m in model if type(m).__name__ == "Pooling"), None)
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+    sample = tokenizer(["export the encoder"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[n] for n in names), path, input_names=names,
+                          output_names=["last_hidden_state"], opset_version=opset,
+                          dynamic_axes={n: {0: "batch", 1: "tokens"} for n in names + ["last_hidden_state"]})
+    config = {"model": model_name, "dim": model.get_sentence_embedding_dimension(),
+              "max_length": model.max_seq_length, "pad_id": tokenizer.pad_token_id or 0,
+              "pooling": "cls" if pooling is not None and pooling.pooling_mode_cls_token else "mean"}
+    with open(os.path.join(out_dir, "encoder.json"), "w") as fh:
+        json.dump(config, fh, indent=2)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(path, os.path.join(out_dir, "model-int8.onnx"), weight_type=QuantType.QInt8)
+    return out_dir
+
+def load_encoder(backend=EMBED_BACKEND):
+    if backend == "onnx":
+        return OnnxEncoder(onnx_model_dir())
+    if backend == "torch":
+        return SentenceTransformerEncoder()
+    raise ValueError(f"unknown EMBED_BACKEND {backend!r} (expected torch or onnx)")
+
+# models are imported and loaded on first use, so processes that only serve
+# pages or /stats never pay for them
+NLP_MODEL = LazyModel("spacy", _load_spacy, lambda nlp: nlp("Warm up the parser."))
+EMBED_MODEL = LazyModel("embedding", load_encoder, lambda encoder: encoder.encode(["warm up"]))
+MODELS = {m.name: m for m in (NLP_MODEL, EMBED_MODEL)}
+
+def warm_up_models(models=None):
+    for model in models or MODELS.values():
+        try:
+            model.warm_up()
+        except Exception:
+            pass  # recorded in model.status(); /ready keeps reporting not ready
+
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+def start_warmup_thread(models=None):
+    """Warm models in the background; a no-op while an earlier warm-up is still running."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None or not _warmup_thread.is_alive():
+            _warmup_thread = threading.Thread(target=warm_up_models, args=(models,), name="model-warmup", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
+
+if os.environ.get("WARMUP_MODELS", "0") == "1":
+    start_warmup_thread()
+
+class StringInterner:
+    """Maps strings to dense int ids (and back) so each distinct name is stored once."""
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, value):
+        """Id for value, assigning a new one if needed; None maps to -1."""
+        if value is None:
+            return -1
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def get(self, value):
+        """Id for value without inserting it (None if unknown)."""
+        return self.ids.get(value)
+
+    def __getitem__(self, i):
+        return None if i < 0 else self.strings[i]
+
+KEY_BASE = 1 << 32
+
+class TripleStore:
+    """Columnar triple store: interned names plus parallel int32 id arrays.
+
+    A triple is a position in the ``s``/``r``/``o`` (and ``ts``/``to`` type)
+    arrays; dicts are only built by ``triple()`` at the JSON boundary. A hash
+    set of packed (s, r, o) keys gives O(1) dedupe, and subject -> triples (SPO)
+    and object -> triples (OPS) adjacency arrays make a node's edges O(degree).
+
+    Graph statistics are maintained incrementally on every insert: per-node
+    reference counts (degree), the number of live nodes, a log2-bucketed degree
+    histogram, per-relation counts and a union-find over nodes for the number of
+    weakly connected components.
+
+    Deleting a triple tombstones its position: the dedupe key, degrees and
+    relation counts are updated at once, adjacency lists skip it on read, and
+    ``compact()`` later drops the dead positions and renumbers the rest. A
+    union-find cannot undo a merge, so a delete only marks the component count
+    stale until ``rebuild_components()`` runs in the background.
+    """
+
+    def __init__(self):
+        self.nodes = StringInterner()
+        self.relations = StringInterner()
+        self.types = StringInterner()
+        self.s, self.r, self.o = array("i"), array("i"), array("i")
+        self.ts, self.to = array("i"), array("i")  # -1 == no type
+        self.keys = set()
+        self.by_subject = {}  # node id -> array of triple positions
+        self.by_object = {}
+        # keys result caches: bumped by deletes here and by the ingest path once added
+        # triples are embedded and indexed, so no search can cache a half-ingested store
+        self.generation = 0
+        self.node_refs = array("i")        # node id -> degree (triple endpoints)
+        self.relation_counts = array("i")  # relation id -> triples using it
+        self.live_nodes = 0
+        self.live_relations = 0            # relations with at least one live triple
+        self.degree_buckets = [0] * 33     # bit_length(degree) -> nodes
+        self.uf_parent = array("i")
+        self.uf_size = array("i")
+        self.components = 0
+        self.sources = StringInterner()  # names of the files triples were loaded from
+        self.src = array("i")            # position -> source id (-1 = none)
+        self.deleted = bytearray()       # position -> 1 once tombstoned (until compact())
+        self.n_deleted = 0
+        self.deletes = 0                 # ever, so a background rebuild can tell it raced one
+        self.compactions = 0
+        self.components_stale = False
+
+    def _key(self, s, r, o):
+        return (s * KEY_BASE + r) * KEY_BASE + o
+
+    def __len__(self):
+        """Number of positions, tombstoned ones included (see live_triples)."""
+        return len(self.s)
+
+    @property
+    def live_triples(self):
+        return len(self.s) - self.n_deleted
+
+    def __iter__(self):
+        return (self.triple(i) for i in range(len(self.s)) if not self.deleted[i])
+
+    def __contains__(self, key):
+        subj, rel, obj = (self.nodes.get(key[0]), self.relations.get(key[1]), self.nodes.get(key[2]))
+        if subj is None or rel is None or obj is None:
+            return False
+        return self._key(subj, rel, obj) in self.keys
+
+    def triple(self, pos):
+        """Materialise the triple at pos as the dict shape the API returns."""
+        return {
+            "subject": self.nodes[self.s[pos]],
+            "relation": self.relations[self.r[pos]],
+            "object": self.nodes[self.o[pos]],
+            "type_subject": self.types[self.ts[pos]],
+            "type_object": self.types[self.to[pos]],
+        }
+
+    def triples_at(self, positions):
+        return [self.triple(i) for i in positions]
+
+    def add(self, triple, source=-1):
+        """Insert a triple dict unless an identical one exists; returns its position or None."""
+        subj = self.nodes.intern(triple["subject"])
+        rel = self.relations.intern(triple["relation"])
+        obj = self.nodes.intern(triple["object"])
+        k = self._key(subj, rel, obj)
+        if k in self.keys:
+            return None
+        self.keys.add(k)
+        pos = len(self.s)
+        self.s.append(subj); self.r.append(rel); self.o.append(obj)
+        self.ts.append(self.types.intern(triple.get("type_subject")))
+        self.to.append(self.types.intern(triple.get("type_object")))
+        self.src.append(source)
+        self.deleted.append(0)
+        self.by_subject.setdefault(subj, array("i")).append(pos)
+        self.by_object.setdefault(obj, array("i")).append(pos)
+        self._count_edge(subj, rel, obj)
+        return pos
+
+    def _grow_node_arrays(self):
+        for i in range(len(self.node_refs), len(self.nodes)):
+            self.node_refs.append(0)
+            self.uf_parent.append(i)
+            self.uf_size.append(1)
+
+    def _ref_node(self, n):
+        d = self.node_refs[n]
+        self.node_refs[n] = d + 1
+        if d == 0:
+            self.live_nodes += 1
+            self.components += 1
+        else:
+            self.degree_buckets[d.bit_length()] -= 1
+        self.degree_buckets[(d + 1).bit_length()] += 1
+
+    def _find(self, x):
+        parent = self.uf_parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return
+        if self.uf_size[ra] < self.uf_size[rb]:
+            ra, rb = rb, ra
+        self.uf_parent[rb] = ra
+        self.uf_size[ra] += self.uf_size[rb]
+        self.components -= 1
+
+    def _count_edge(self, subj, rel, obj):
+        self._grow_node_arrays()
+        while len(self.relation_counts) <= rel:
+            self.relation_counts.append(0)
+        if not self.relation_counts[rel]:
+            self.live_relations += 1
+        self.relation_counts[rel] += 1
+        self._ref_node(subj)
+        self._ref_node(obj)
+        self._union(subj, obj)
+
+    def graph_summary(self):
+        """O(1) snapshot of the incrementally maintained counters."""
+        top = max((i for i, c in enumerate(self.degree_buckets) if c), default=0)
+        return {
+            "nodes": self.live_nodes,
+            "triples": self.live_triples,
+            "relations": self.live_relations,
+            "connected_components": self.components,
+            "components_stale": self.components_stale,
+            "tombstones": self.n_deleted,
+            # bucket i holds nodes with degree in [2**(i-1), 2**i - 1]
+            "degree_histogram": [{"min": 1 << (i - 1), "max": (1 << i) - 1, "nodes": self.degree_buckets[i]}
+                                 for i in range(1, top + 1)],
+        }
+
+    def add_many(self, triples, source=None):
+        """Bulk insert; returns (positions of newly added triples, number of duplicates)."""
+        added, duplicates = [], 0
+        src = self.sources.intern(source)
+        for t in triples:
+            pos = self.add(t, src)
+            if pos is None:
+                duplicates += 1
+            else:
+                added.append(pos)
+        return added, duplicates
+
+    def upsert_many(self, triples, source=None):
+        """Insert new triples and overwrite the types of existing ones; returns (added, updated) positions."""
+        added, updated = [], []
+        src = self.sources.intern(source)
+        for t in triples:
+            pos = self.add(t, src)
+            if pos is not None:
+                added.append(pos)
+                continue
+            pos = self.find(t["subject"], t["relation"], t["object"])
+            ts, to = self.types.intern(t.get("type_subject")), self.types.intern(t.get("type_object"))
+            if self.ts[pos] != ts or self.to[pos] != to:
+                self.ts[pos], self.to[pos] = ts, to
+                updated.append(pos)
+        return added, updated
+
+    def key_of(self, subject, relation, obj):
+        """Packed dedupe key of a triple whose names are all known, else None."""
+        ids = (self.nodes.get(subject), self.relations.get(relation), self.nodes.get(obj))
+        return None if None in ids else self._key(*ids)
+
+    def find(self, subject, relation, obj):
+        """Position of the live triple (subject, relation, object), or None; O(min degree)."""
+        key = self.key_of(subject, relation, obj)
+        if key is None or key not in self.keys:
+            return None
+        s, r, o = self.nodes.get(subject), self.relations.get(relation), self.nodes.get(obj)
+        cand = min(self.by_subject[s], self.by_object[o], key=len)
+        cand = np.frombuffer(cand, dtype=np.int32)
+        hits = cand[(np.frombuffer(self.s, dtype=np.int32)[cand] == s) & (np.frombuffer(self.r, dtype=np.int32)[cand] == r)
+                    & (np.frombuffer(self.o, dtype=np.int32)[cand] == o)]
+        live = [int(p) for p in hits if not self.deleted[p]]
+        return live[-1] if live else None
+
+    def _unref_node(self, n):
+        d = self.node_refs[n]
+        self.node_refs[n] = d - 1
+        self.degree_buckets[d.bit_length()] -= 1
+        if d == 1:
+            self.live_nodes -= 1
+        else:
+            self.degree_buckets[(d - 1).bit_length()] += 1
+
+    def delete_many(self, positions):
+        """Tombstone the triples at positions; returns (deleted positions, names of nodes left without edges)."""
+        deleted, orphans = [], []
+        for pos in positions:
+            if self.deleted[pos]:
+                continue
+            s, r, o = self.s[pos], self.r[pos], self.o[pos]
+            self.deleted[pos] = 1
+            self.keys.discard(self._key(s, r, o))
+            self.relation_counts[r] -= 1
+            if not self.relation_counts[r]:
+                self.live_relations -= 1
+            self._unref_node(s)
+            self._unref_node(o)
+            orphans.extend(self.nodes[n] for n in ((s,) if s == o else (s, o)) if self.node_refs[n] == 0)
+            deleted.append(pos)
+        if deleted:
+            self.n_deleted += len(deleted)
+            self.deletes += len(deleted)
+            self.components_stale = True
+            self.generation += 1
+        return deleted, orphans
+
+    def owned_positions(self, source):
+        """Live positions first loaded from source (a file name)."""
+        sid = self.sources.get(source)
+        if sid is None:
+            return []
+        src = np.frombuffer(self.src, dtype=np.int32)
+        dead = np.frombuffer(self.deleted, dtype=np.uint8)
+        return np.flatnonzero((src == sid) & (dead == 0)).tolist()
+
+    def live_positions(self, start, end):
+        if not self.n_deleted:
+            return range(start, end)
+        return [p for p in range(start, end) if not self.deleted[p]]
+
+    def compact(self):
+        """Drop tombstoned positions and renumber the rest in order; returns old -> new (-1 = dropped)."""
+        keep = np.flatnonzero(np.frombuffer(self.deleted, dtype=np.uint8) == 0)
+        remap = np.full(len(self.s), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        for name in ("s", "r", "o", "ts", "to", "src"):
+            column = np.frombuffer(getattr(self, name), dtype=np.int32)[keep]
+            setattr(self, name, array("i", column.tobytes()))
+        for adjacency in (self.by_subject, self.by_object):
+            for node, positions in list(adjacency.items()):
+                moved = remap_rows(positions, remap)
+                if len(moved):
+                    adjacency[node] = moved
+                else:
+                    del adjacency[node]
+        self.deleted = bytearray(len(keep))
+        self.n_deleted = 0
+        self.compactions += 1
+        self.generation += 1
+        return remap
+
+    def rebuild_components(self, read_lock, write_lock):
+        """Recount connected components from the live triples after deletions.
+
+        The columns are copied under ``read_lock()`` and the O(triples)
+        union-find pass runs on the copy without any lock; triples appended
+        meanwhile are replayed under ``write_lock()`` before the result is
+        swapped in. A delete or compaction during the pass leaves the count
+        stale for the next run.
+        """
+        with read_lock():
+            deletes, compactions, upto = self.deletes, self.compactions, len(self.s)
+            subjects, objects, deleted = array("i", self.s), array("i", self.o), bytes(self.deleted)
+            n_nodes = len(self.node_refs)
+        parent, size = array("i", range(n_nodes)), array("i", [1]) * n_nodes
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+        merged = 0
+        for pos in range(upto):
+            if deleted[pos]:
+                continue
+            ra, rb = find(subjects[pos]), find(objects[pos])
+            if ra != rb:
+                if size[ra] < size[rb]:
+                    ra, rb = rb, ra
+                parent[rb] = ra
+                size[ra] += size[rb]
+                merged += 1
+        with write_lock():
+            if self.deletes != deletes or self.compactions != compactions:
+                return False
+            grow = len(self.node_refs) - len(parent)
+            parent.extend(range(len(parent), len(self.node_refs)))
+            size.extend([1] * grow)
+            self.uf_parent, self.uf_size = parent, size
+            self.components = self.live_nodes - merged
+            for pos in range(upto, len(self.s)):
+                self._union(self.s[pos], self.o[pos])
+            self.components_stale = False
+        return True
+
+    def recent(self, n):
+        if not self.n_deleted:
+            return self.triples_at(range(max(0, len(self.s) - n), len(self.s)))
+        positions, pos = [], len(self.s) - 1
+        while pos >= 0 and len(positions) < n:
+            if not self.deleted[pos]:
+                positions.append(pos)
+            pos -= 1
+        return self.triples_at(reversed(positions))
+
+    def node_names(self, positions):
+        """Subject and object names of the triples at positions (with repeats)."""
+        names = []
+        for i in positions:
+            names.append(self.nodes[self.s[i]]); names.append(self.nodes[self.o[i]])
+        return names
+
+    def _edge_positions(self, node_id, direction="both"):
+        out = self.by_subject.get(node_id, ()) if direction in ("out", "both") else ()
+        inc = self.by_object.get(node_id, ()) if direction in ("in", "both") else ()
+        if not inc:
+            positions = list(out)
+        elif not out:
+            positions = list(inc)
+        else:
+            # self-loops appear in both lists
+            positions = list(dict.fromkeys(list(out) + list(inc)))
+        if self.n_deleted:
+            positions = [p for p in positions if not self.deleted[p]]
+        return positions
+
+    def edge_positions(self, node, direction="both"):
+        """Positions of triples where node is the subject ("out"), object ("in") or either."""
+        node_id = self.nodes.get(node)
+        return [] if node_id is None else self._edge_positions(node_id, direction)
+
+    def edges_of(self, node, direction="both"):
+        return self.triples_at(self.edge_positions(node, direction))
+
+    def degree(self, node):
+        node_id = self.nodes.get(node)
+        return 0 if node_id is None else self.node_refs[node_id]
+
+    def neighbourhood(self, node, hops=1, relations=None, direction="both", max_fanout=None):
+        """Breadth-first k-hop expansion from node.
+
+        Returns (triple positions in BFS order, {node: hop distance}, truncated),
+        where truncated says whether any node had more matching edges than
+        max_fanout. Cost is proportional to the degrees of the visited nodes.
+        """
+        start = self.nodes.get(node)
+        if start is None:
+            return [], {node: 0}, False
+        if relations:
+            relations = {self.relations.get(r) for r in relations} - {None}
+        else:
+            relations = None
+        distance = {start: 0}
+        seen_edges, order, truncated = set(), [], False
+        frontier = [start]
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for current in frontier:
+                taken = 0
+                for pos in self._edge_positions(current, direction):
+                    if relations is not None and self.r[pos] not in relations:
+                        continue
+                    if max_fanout is not None and taken >= max_fanout:
+                        truncated = True
+                        break
+                    taken += 1
+                    if pos not in seen_edges:
+                        seen_edges.add(pos); order.append(pos)
+                    other = self.o[pos] if self.s[pos] == current else self.s[pos]
+                    if other not in distance:
+                        distance[other] = hop
+                        next_frontier.append(other)
+            frontier = next_frontier
+            if not frontier:
+                break
+        return order, {self.nodes[n]: h for n, h in distance.items()}, truncated
+
+semantic_search_data = TripleStore()
+# guards semantic_search_data, NODE_EMBEDDINGS and VECTOR_INDEXES: searches read
+# concurrently, ingest takes the write side only for in-memory mutations
+STORE_LOCK = RWLock()
 
 STATS = {
     "files_uploaded": 0,
     "triples_total": 0,
     "unique_nodes": 0,
     "graphs_processed": 0,
-    "processing_jobs": 0,
     "last_graph_time_ms": 0,
     "last_uploaded_file": None
 }
 FEEDBACK = {"ratings": []}
+STATS_LOCK = threading.Lock()  # guards STATS, FEEDBACK and PROCESSING_ACTIVITY
+
+def incr_stat(key, n=1):
+    with STATS_LOCK:
+        STATS[key] = STATS.get(key, 0) + n
+    if SNAPSHOT is not None and SNAPSHOT.shared:
+        SNAPSHOT.incr_counter(key, n)
+
+def set_stat(key, value):
+    with STATS_LOCK:
+        STATS[key] = value
+    if SNAPSHOT is not None and SNAPSHOT.shared:
+        SNAPSHOT.set_state(key, value)
 
 def recalc_node_counts():
-    nodes = set()
-    for t in semantic_search_data:
-        nodes.add(t.get("subject"))
-        nodes.add(t.get("object"))
-    STATS["unique_nodes"] = len(nodes)
-    STATS["triples_total"] = len(semantic_search_data)
-
-# processing daily counts (0=Mon .. 6=Sun)
-PROCESSING_DAILY = {i: 0 for i in range(7)}
+    # O(1): the store maintains its node/triple counts incrementally
+    with STATS_LOCK:
+        STATS["unique_nodes"] = semantic_search_data.live_nodes
+        STATS["triples_total"] = semantic_search_data.live_triples
+
+# -------------------------
+# Instrumentation
+# -------------------------
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds), cumulative like a Prometheus histogram."""
+    BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+              1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def cumulative(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        running, out = 0, []
+        for le, c in zip(self.bounds + (float("inf"),), counts):
+            running += c
+            out.append((le, running))
+        return out, total, count
+
+    def quantile(self, q):
+        """q-quantile, interpolated linearly inside its bucket like histogram_quantile()."""
+        buckets, _, count = self.cumulative()
+        if not count:
+            return None
+        rank, lower, below = q * count, 0.0, 0
+        for le, c in buckets:
+            if c >= rank:
+                if le == float("inf"):
+                    return self.bounds[-1]
+                return lower + (le - lower) * (rank - below) / max(c - below, 1)
+            lower, below = le, c
+
+    def summary(self):
+        _, total, count = self.cumulative()
+        ms = lambda s: None if s is None else round(s * 1000, 3)  # noqa: E731
+        return {"count": count, "sum_s": round(total, 6), "mean_ms": ms(total / count) if count else None,
+                "p50_ms": ms(self.quantile(0.5)), "p95_ms": ms(self.quantile(0.95)),
+                "p99_ms": ms(self.quantile(0.99))}
+
+class StageTimer:
+    """One LatencyHistogram per pipeline stage (or endpoint), created on first use."""
+
+    def __init__(self, names=()):
+        self.histograms = {n: LatencyHistogram() for n in names}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, LatencyHistogram())
+        hist.observe(seconds)
+
+    @contextmanager
+    def time(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def summary(self):
+        return {n: h.summary() for n, h in list(self.histograms.items())}
+
+PIPELINE_STAGES = ("csv_decode", "parse", "dedupe", "spacy", "extract", "embedding",
+                   "lexical", "similarity", "topk", "layout", "serialise")
+STAGE_TIMINGS = StageTimer(PIPELINE_STAGES)
+REQUEST_TIMINGS = StageTimer()  # keyed by Flask endpoint name
+
+class TimeBuckets:
+    """Ring buffer of counts per fixed-width time bucket (default: hourly for a week).
+
+    Each slot remembers which bucket it holds, so a slot left over from an
+    earlier lap of the ring is reset instead of being added to.
+    """
+
+    def __init__(self, bucket_s=3600, n_buckets=168):
+        self.bucket_s = int(bucket_s)
+        self.n_buckets = int(n_buckets)
+        self.ids = [-1] * self.n_buckets
+        self.counts = [0] * self.n_buckets
+
+    def bucket_id(self, ts=None):
+        return int((time.time() if ts is None else ts) // self.bucket_s)
+
+    def add(self, n, ts=None):
+        self.set(self.bucket_id(ts), n, add=True)
+
+    def set(self, bucket, value, add=False):
+        slot = bucket % self.n_buckets
+        if self.ids[slot] != bucket:
+            if self.ids[slot] > bucket:
+                return  # older than what the ring holds
+            self.ids[slot], self.counts[slot] = bucket, 0
+        self.counts[slot] = self.counts[slot] + value if add else value
+
+    def series(self, width_s, n, now=None):
+        """n consecutive totals of width_s seconds each, oldest first, ending with the current one."""
+        per = max(1, int(width_s) // self.bucket_s)
+        last = self.bucket_id(now)
+        first = (last // per - n + 1) * per
+        totals = [0] * n
+        for bucket, count in zip(self.ids, self.counts):
+            if bucket >= first and bucket <= last:
+                totals[(bucket - first) // per] += count
+        return [(first + i * per) * self.bucket_s for i in range(n)], totals
+
+    def to_dict(self):
+        return {"bucket_s": self.bucket_s, "buckets": {str(b): c for b, c in zip(self.ids, self.counts) if b >= 0}}
+
+    def load(self, data):
+        if data.get("bucket_s") == self.bucket_s:
+            for bucket, count in data.get("buckets", {}).items():
+                self.set(int(bucket), count)
+
+def encode_direct(texts):
+    """Encode texts into L2-normalised float32 rows (dot product == cosine)."""
+    model = EMBED_MODEL.get()
+    with STAGE_TIMINGS.time("embedding"):
+        embs = model.encode(list(texts))
+    return np.ascontiguousarray(embs, dtype=np.float32)
+
+class _EncodeRequest:
+    __slots__ = ("texts", "done", "result", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class EmbeddingBatcher:
+    """Micro-batching front end for the embedding model.
+
+    Callers block in ``encode()`` while a single scheduler thread coalesces
+    pending requests into one model call, flushing at ``max_batch`` texts or
+    after ``max_wait_ms``. Interactive requests (queries) are served before bulk
+    ones, and bulk requests are split into ``max_batch`` chunks so a large
+    ingest cannot hold queries back for its whole duration. When the previous
+    batch held a single request and nothing else is queued (an idle server),
+    the wait is skipped so a lone query pays no batching delay.
+    """
+
+    INTERACTIVE, BULK = 0, 1
+
+    def __init__(self, encode, max_batch=64, max_wait_ms=5):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.PriorityQueue()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.texts = 0
+        self._last_requests = 0
+        # batch size -> count, bucketed by powers of two (1, 2, 4, ...)
+        self.histogram = OrderedDict((b, 0) for b in self._buckets())
+
+    def _buckets(self):
+        b, out = 1, []
+        while b < self.max_batch:
+            out.append(b); b *= 2
+        return out + [self.max_batch]
+
+    def _put(self, priority, req):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._seq += 1
+            self.queue.put((priority, self._seq, req))
+
+    def encode(self, texts, interactive=False):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        priority = self.INTERACTIVE if interactive else self.BULK
+        reqs = [_EncodeRequest(texts[i:i + self.max_batch]) for i in range(0, len(texts), self.max_batch)]
+        for req in reqs:
+            self._put(priority, req)
+        for req in reqs:
+            req.done.wait()
+            if req.error is not None:
+                raise req.error
+        return reqs[0].result if len(reqs) == 1 else np.concatenate([r.result for r in reqs])
+
+    def _run(self):
+        while True:
+            _, _, first = self.queue.get()
+            pending, n = [first], len(first.texts)
+            wait = self.max_wait if (self._last_requests > 1 or not self.queue.empty()) else 0.0
+            deadline = time.monotonic() + wait
+            while n < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if n + len(item[2].texts) > self.max_batch:
+                    self.queue.put(item)  # keep it for the next batch
+                    break
+                pending.append(item[2]); n += len(item[2].texts)
+            self._last_requests = len(pending)
+            self._flush(pending, n)
+
+    def _flush(self, pending, n):
+        try:
+            embs = self._encode([t for req in pending for t in req.texts])
+            start = 0
+            for req in pending:
+                req.result = embs[start:start + len(req.texts)]
+                start += len(req.texts)
+        except Exception as e:
+            for req in pending:
+                req.error = e
+        finally:
+            self.batches += 1
+            self.texts += n
+            bucket = next(b for b in self.histogram if n <= b)
+            self.histogram[bucket] += 1
+            for req in pending:
+                req.done.set()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else None,
+            "batch_size_histogram": [{"le": b, "count": c} for b, c in self.histogram.items()],
+        }
+
+EMBEDDING_BATCHER = None
+if os.environ.get("EMBED_BATCHING", "1") == "1":
+    EMBEDDING_BATCHER = EmbeddingBatcher(encode_direct,
+                                         max_batch=int(os.environ.get("EMBED_MAX_BATCH", 64)),
+                                         max_wait_ms=float(os.environ.get("EMBED_MAX_WAIT_MS", 5)))
+
+def encode_texts(texts, interactive=False):
+    """Encode texts through the micro-batcher when enabled (interactive = latency sensitive)."""
+    if EMBEDDING_BATCHER is None:
+        return encode_direct(texts)
+    return EMBEDDING_BATCHER.encode(texts, interactive=interactive)
+
+class NodeEmbeddingStore:
+    """Persistent node -> embedding store backed by one contiguous float32 matrix.
+
+    Nodes are encoded once, when they are first inserted; searching only has to
+    encode the query and take a dot product against ``matrix()``. Rows of
+    nodes that left the graph are ``retire()``d rather than removed: indexes
+    skip them, a node that comes back reuses its row, and ``compact()`` drops
+    them for good.
+    """
+
+    def __init__(self, encode=encode_texts, capacity=1024):
+        self.encode = encode
+        self.row_of = {}   # node -> row index
+        self.nodes = []    # row index -> node
+        self._matrix = None
+        self._capacity = capacity
+        self.retired = set()
+        self._retired_rows = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.row_of
+
+    def _reserve(self, n, dim):
+        if self._matrix is None:
+            self._matrix = np.zeros((max(self._capacity, n), dim), dtype=np.float32)
+        elif n > self._matrix.shape[0]:
+            # grow geometrically so appends stay amortised O(1) per row
+            grown = np.zeros((max(n, 2 * self._matrix.shape[0]), dim), dtype=np.float32)
+            grown[:len(self.nodes)] = self._matrix[:len(self.nodes)]
+            self._matrix = grown
+
+    def missing(self, nodes):
+        """Distinct, non-empty nodes that have no embedding yet."""
+        return [n for n in dict.fromkeys(nodes) if n and n not in self.row_of]
+
+    def add_encoded(self, nodes, embs):
+        """Append precomputed rows, skipping nodes already present; returns the new row ids."""
+        keep = [i for i, n in enumerate(nodes) if n not in self.row_of]
+        if not keep:
+            return []
+        if len(keep) != len(nodes):
+            nodes, embs = [nodes[i] for i in keep], embs[keep]
+        start = len(self.nodes)
+        self._reserve(start + len(nodes), embs.shape[1])
+        self._matrix[start:start + len(nodes)] = embs
+        for i, n in enumerate(nodes):
+            self.row_of[n] = start + i
+            self.nodes.append(n)
+        return list(range(start, start + len(nodes)))
+
+    def add(self, nodes):
+        """Encode and append nodes not seen before; returns their new row ids."""
+        new = self.missing(nodes)
+        if not new:
+            return []
+        return self.add_encoded(new, self.encode(new))
+
+    def load(self, nodes, matrix):
+        """Adopt prebuilt rows (e.g. a read-only memmap); the first add() copies them."""
+        self.nodes = list(nodes)
+        self.row_of = {n: i for i, n in enumerate(self.nodes)}
+        self._matrix = matrix
+
+    def matrix(self):
+        """Contiguous (n_nodes, dim) view over the stored embeddings."""
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:len(self.nodes)]
+
+    def retire(self, nodes):
+        rows = {self.row_of[n] for n in nodes if n in self.row_of} - self.retired
+        if rows:
+            self.retired |= rows
+            self._retired_rows = None
+
+    def revive(self, nodes):
+        if self.retired:
+            rows = {self.row_of[n] for n in nodes if n in self.row_of} & self.retired
+            if rows:
+                self.retired -= rows
+                self._retired_rows = None
+
+    def live_mask(self, rows):
+        """Boolean mask over rows (an int array): True where the row is not retired."""
+        if not self.retired:
+            return np.ones(len(rows), dtype=bool)
+        if self._retired_rows is None:
+            self._retired_rows = np.fromiter(self.retired, dtype=np.int64, count=len(self.retired))
+        return ~np.isin(rows, self._retired_rows)
+
+    def live(self, rows):
+        return rows[self.live_mask(rows)] if self.retired else rows
+
+    def compact(self):
+        """Drop retired rows; returns old row -> new row (-1 = dropped) for the indexes to remap."""
+        keep = np.ones(len(self.nodes), dtype=bool)
+        keep[list(self.retired)] = False
+        remap = np.full(len(self.nodes), -1, dtype=np.int64)
+        remap[keep] = np.arange(int(keep.sum()))
+        kept = np.flatnonzero(keep)
+        self._matrix = np.ascontiguousarray(self.matrix()[kept], dtype=np.float32)
+        self.nodes = [self.nodes[i] for i in kept]
+        self.row_of = {n: i for i, n in enumerate(self.nodes)}
+        self.retired, self._retired_rows = set(), None
+        return remap
+
+def remap_rows(rows, remap):
+    """Map an array("q"/"i") of row ids through a compact() remap, dropping removed rows; order is kept."""
+    dtype = np.int64 if rows.typecode == "q" else np.int32
+    moved = remap[np.frombuffer(rows, dtype=dtype)]
+    return array(rows.typecode, moved[moved >= 0].astype(dtype).tobytes())
+
+NODE_EMBEDDINGS = NodeEmbeddingStore()
+
+# -------------------------
+# Query caches
+# -------------------------
+class LRUCache:
+    """Bounded, thread-safe LRU mapping with an optional TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]  # expired
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl_s": self.ttl,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else None}
+
+QUERY_EMBEDDING_CACHE = LRUCache(int(os.environ.get("QUERY_CACHE_SIZE", 4096)),
+                                 ttl=float(os.environ.get("QUERY_CACHE_TTL_S", 3600)))
+# keyed on the store generation too, so results never outlive an ingest
+SEARCH_RESULT_CACHE = LRUCache(int(os.environ.get("RESULT_CACHE_SIZE", 1024)),
+                               ttl=float(os.environ.get("RESULT_CACHE_TTL_S", 300)))
+
+def normalise_query(query):
+    return " ".join(query.split())
+
+def encode_query(query):
+    """Query embedding, served from QUERY_EMBEDDING_CACHE when possible."""
+    key = normalise_query(query)
+    emb = QUERY_EMBEDDING_CACHE.get(key)
+    if emb is None:
+        emb = encode_texts([key], interactive=True)[0]
+        QUERY_EMBEDDING_CACHE.put(key, emb)
+    return emb
+
+# -------------------------
+# Vector indexes (search backends over NODE_EMBEDDINGS)
+# -------------------------
+def top_k_indices(scores, k):
+    """Indices of the k largest scores, best first, via argpartition (O(n + k log k))."""
+    k = min(int(k), len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+class ExactIndex:
+    """Brute-force search: one matrix-vector product over every stored row."""
+    name = "exact"
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, rows):
+        pass  # reads the store matrix directly, nothing to maintain
+
+    def remap(self, remap):
+        pass
+
+    def search(self, query, k, **params):
+        with STAGE_TIMINGS.time("similarity"):
+            scores = self.store.matrix() @ query
+        with STAGE_TIMINGS.time("topk"):
+            if self.store.retired:
+                scores[list(self.store.retired)] = -np.inf
+                k = min(k, len(scores) - len(self.store.retired))
+            idx = top_k_indices(scores, k)
+        return idx, scores[idx]
+
+def _assign_rows(mat, rows, centroids, lists):
+    """Append each row to the list of its nearest centroid."""
+    for start in range(0, len(rows), 65536):
+        chunk = rows[start:start + 65536]
+        nearest = np.argmax(mat[chunk] @ centroids.T, axis=1)
+        for row, c in zip(chunk.tolist(), nearest.tolist()):
+            lists[c].append(row)
+
+class IVFIndex:
+    """Inverted-file ANN index: spherical k-means centroids with per-centroid row lists.
+
+    Queries only score the rows in the ``nprobe`` closest lists, so ``nprobe`` is
+    the recall/latency knob (``nprobe == n_lists`` is exact). New rows are assigned
+    to their nearest centroid as they arrive; the centroids are retrained once the
+    store has grown ``retrain_factor`` times since the last training.
+
+    With a ``write_lock`` (the store's), training runs on a background thread
+    over the rows present when it starts, without the lock, so searches keep
+    running; new rows go to the old lists meanwhile and the result is swapped
+    in under ``write_lock()``. Without one, ``add`` trains inline.
+    """
+    name = "ivf"
+
+    def __init__(self, store, nprobe=8, train_min=2048, retrain_factor=4, kmeans_iters=10, seed=0,
+                 write_lock=None):
+        self.store = store
+        self.write_lock = write_lock
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self.retrain_factor = retrain_factor
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.centroids = None
+        self.lists = []       # centroid -> array('q') of store rows
+        self.trained_size = 0
+        self.training = False
+        self.remaps = 0       # compactions seen; a background training that raced one is dropped
+
+    @property
+    def n_lists(self):
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def train(self):
+        """(Re)fit centroids on a sample of the store and reassign every row."""
+        n = len(self.store)
+        self.centroids, self.lists = self._fit(self.store.matrix()[:n])
+        self.trained_size = n
+
+    def _train_in_background(self, n):
+        # rows below n are never rewritten in place (only compaction renumbers them)
+        mat, remaps, fitted = self.store.matrix()[:n], self.remaps, None
+        try:
+            fitted = self._fit(mat)
+        finally:
+            with self.write_lock():
+                self.training = False
+                if fitted is not None and self.remaps == remaps:
+                    self.centroids, self.lists = fitted
+                    self.trained_size = n
+                    self._assign(np.arange(n, len(self.store)))  # rows added while training
+
+    def _fit(self, mat):
+        """k-means centroids for the rows of mat and their lists; touches no index state."""
+        n = len(mat)
+        n_lists = int(min(4096, max(8, np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        sample = mat[rng.choice(n, size=min(n, 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # keep the previous centroid for clusters that lost all their points
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        centroids = centroids.astype(np.float32)
+        lists = [array("q") for _ in range(n_lists)]
+        _assign_rows(mat, np.arange(n), centroids, lists)
+        return centroids, lists
+
+    def _assign(self, rows):
+        _assign_rows(self.store.matrix(), rows, self.centroids, self.lists)
+
+    def add(self, rows):
+        n = len(self.store)
+        due = n >= self.train_min if self.centroids is None else n >= self.retrain_factor * self.trained_size
+        if due and self.write_lock is None:
+            self.train()  # assigns every row, rows included
+            return
+        if due and not self.training:
+            self.training = True
+            threading.Thread(target=self._train_in_background, args=(n,), name="ivf-train", daemon=True).start()
+        if self.centroids is not None and len(rows):
+            self._assign(np.asarray(rows, dtype=np.int64))
+
+    def remap(self, remap):
+        """Follow a store compaction: renumber list entries, no retraining."""
+        self.lists = [remap_rows(rows, remap) for rows in self.lists]
+        self.remaps += 1
+
+    def search(self, query, k, nprobe=None, **params):
+        if self.centroids is None:
+            # too few rows to be worth clustering: brute force is cheaper
+            return ExactIndex(self.store).search(query, k)
+        nprobe = max(1, min(int(nprobe or self.nprobe), self.n_lists))
+        with STAGE_TIMINGS.time("similarity"):
+            probes = top_k_indices(self.centroids @ query, nprobe)
+            parts = [np.frombuffer(self.lists[p], dtype=np.int64) for p in probes if len(self.lists[p])]
+            if not parts:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            cand = self.store.live(np.concatenate(parts))
+            scores = self.store.matrix()[cand] @ query
+        with STAGE_TIMINGS.time("topk"):
+            idx = top_k_indices(scores, k)
+        return cand[idx], scores[idx]
+
+VECTOR_INDEXES = {
+    "exact": ExactIndex(NODE_EMBEDDINGS),
+    "ivf": IVFIndex(NODE_EMBEDDINGS, nprobe=int(os.environ.get("SEARCH_NPROBE", 8)), write_lock=STORE_LOCK.write),
+}
+# exact by default: IVF trades recall for latency (~0.85 recall@10 at nprobe=8 on 50k
+# vectors, see benchmarks/bench_vector_index.py), so deployments opt in to it
+DEFAULT_SEARCH_INDEX = os.environ.get("SEARCH_INDEX", "exact")
+MAX_SEARCH_K = 100
+
+# -------------------------
+# Lexical index (trigrams + sorted prefixes over node names)
+# -------------------------
+def normalise_name(text):
+    return " ".join(text.lower().split())
+
+def name_trigrams(norm):
+    padded = f" {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LexicalIndex:
+    """Trigram inverted index and sorted prefix list over NODE_EMBEDDINGS rows.
+
+    ``search`` ranks rows by trigram Jaccard similarity to the query, which
+    puts exact names such as "Ulm" or "1905" first (score 1.0). ``complete``
+    answers prefix lookups against the full name and every later word in it,
+    so "ein" finds "Albert Einstein". New rows go to a small sorted tail that
+    is merged into the main prefix list once it outgrows ``merge_at`` (or an
+    eighth of the main list), so a batch never re-sorts the whole list.
+    ``degree`` (name -> int) ranks completions; without it they rank by name only.
+    """
+
+    def __init__(self, store, max_posting_fraction=0.2, merge_at=4096, degree=None):
+        self.store = store
+        self.degree = degree or (lambda name: 0)
+        self.max_posting_fraction = max_posting_fraction
+        self.merge_at = merge_at
+        self.postings = {}            # trigram -> array("i") of rows
+        self.gram_counts = array("H")  # row -> number of distinct trigrams
+        self.prefixes = []            # sorted (word-start suffix of name, row)
+        self.tail = []
+
+    def __len__(self):
+        return len(self.gram_counts)
+
+    def add(self, rows):
+        for row in rows:
+            if row < len(self.gram_counts):
+                continue
+            norm = normalise_name(self.store.nodes[row])
+            grams = name_trigrams(norm)
+            for g in grams:
+                posting = self.postings.get(g)
+                if posting is None:
+                    posting = self.postings[g] = array("i")
+                posting.append(row)
+            self.gram_counts.append(min(len(grams), 65535))
+            words = norm.split(" ")
+            self.tail.extend((" ".join(words[i:]), row) for i in range(len(words)))
+        self.tail.sort()
+        if len(self.tail) > max(self.merge_at, len(self.prefixes) // 8):
+            self.prefixes = sorted(self.prefixes + self.tail)  # two sorted runs: timsort merges them in O(n)
+            self.tail = []
+
+    def search(self, query, k):
+        """Top-k rows by trigram Jaccard similarity, as (rows, scores)."""
+        grams = name_trigrams(normalise_name(query))
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        # very common trigrams (" th", "the") add candidates but little signal
+        cap = max(1000, int(self.max_posting_fraction * len(self)))
+        selective = [p for p in lists if len(p) <= cap] or [min(lists, key=len)]
+        with STAGE_TIMINGS.time("lexical"):
+            cand, shared = np.unique(np.concatenate([np.frombuffer(p, dtype=np.int32) for p in selective]),
+                                     return_counts=True)
+            if self.store.retired:
+                live = self.store.live_mask(cand)
+                cand, shared = cand[live], shared[live]
+            counts = np.frombuffer(self.gram_counts, dtype=np.uint16)[cand].astype(np.float32)
+            scores = shared / (len(grams) + counts - shared)
+            idx = top_k_indices(scores, k)
+        return cand[idx].astype(np.int64), scores[idx].astype(np.float32)
+
+    def similarity(self, query, rows):
+        """Trigram Jaccard of query against specific rows (for rows found by dense search)."""
+        q = name_trigrams(normalise_name(query))
+        out = np.zeros(len(rows), dtype=np.float32)
+        for i, row in enumerate(rows):
+            g = name_trigrams(normalise_name(self.store.nodes[row]))
+            out[i] = len(q & g) / len(q | g)
+        return out
+
+    def complete(self, prefix, limit=10, scan=2000):
+        """Rows whose name, or a word-start suffix of it, begins with prefix.
+
+        Up to ``scan`` matches are collected; full-name matches rank first,
+        then better-connected and shorter names.
+        """
+        prefix = normalise_name(prefix)
+        if not prefix:
+            return []
+        found = {}
+        for entries in (self.prefixes, self.tail):
+            i = bisect.bisect_left(entries, (prefix,))
+            while i < len(entries) and len(found) < scan and entries[i][0].startswith(prefix):
+                key, row = entries[i]
+                i += 1
+                if row in self.store.retired:
+                    continue
+                full = len(key) == len(normalise_name(self.store.nodes[row]))
+                found[row] = found.get(row, False) or full
+        names = self.store.nodes
+        ranked = sorted(found, key=lambda r: (not found[r], -self.degree(names[r]), len(names[r])))
+        return ranked[:limit]
+
+    def remap(self, remap):
+        """Follow a store compaction; remap is monotonic, so the prefix lists stay sorted."""
+        for gram, rows in list(self.postings.items()):
+            moved = remap_rows(rows, remap)
+            if len(moved):
+                self.postings[gram] = moved
+            else:
+                del self.postings[gram]
+        keep = remap[:len(self.gram_counts)] >= 0
+        self.gram_counts = array("H", np.frombuffer(self.gram_counts, dtype=np.uint16)[keep].tobytes())
+        new_row = remap.tolist()
+        self.prefixes = [(key, new_row[row]) for key, row in self.prefixes if new_row[row] >= 0]
+        self.tail = [(key, new_row[row]) for key, row in self.tail if new_row[row] >= 0]
+
+LEXICAL_INDEX = LexicalIndex(NODE_EMBEDDINGS, degree=semantic_search_data.degree)
+
+def index_new_rows(rows):
+    """Add freshly embedded NODE_EMBEDDINGS rows to every search index (caller holds STORE_LOCK.write())."""
+    for index in VECTOR_INDEXES.values():
+        index.add(rows)
+    LEXICAL_INDEX.add(rows)
+
+def embed_new_nodes(positions):
+    """Encode subjects/objects of freshly inserted triples and index the new rows."""
+    with STORE_LOCK.read():
+        new = NODE_EMBEDDINGS.missing(semantic_search_data.node_names(positions))
+    if not new:
+        return []
+    embs = NODE_EMBEDDINGS.encode(new)
+    with STORE_LOCK.write():
+        rows = NODE_EMBEDDINGS.add_encoded(new, embs)
+        index_new_rows(rows)
+    return rows
+
+# -------------------------
+# Edge index (embeddings of verbalised triples)
+# -------------------------
+def triple_sentence(t):
+    """Verbalised triple, as listed by /search_node and embedded by the edge index."""
+    return f"{t['subject']} {t['relation']} {t['object']}"
+
+class EdgeIndex:
+    """Embeddings of "subject relation object" sentences, one row per distinct sentence.
+
+    Rows live in their own NodeEmbeddingStore (keyed by sentence) with their
+    own exact and IVF indexes; ``positions[row]`` is the triple the row was
+    built from. commit_triples() encodes new sentences in the same batched
+    model call as new nodes, so a triple search only encodes the query.
+    """
+
+    def __init__(self, triples, nprobe=8):
+        self.triples = triples
+        self.vectors = NodeEmbeddingStore()
+        self.positions = array("q")  # row -> triple position (-1 until linked)
+        ivf = IVFIndex(self.vectors, nprobe=nprobe, write_lock=STORE_LOCK.write)
+        self.indexes = {"exact": ExactIndex(self.vectors), "ivf": ivf}
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def sentences(self, positions):
+        return [triple_sentence(t) for t in self.triples.triples_at(positions)]
+
+    def _grow(self):
+        grow = len(self.vectors) - len(self.positions)
+        if grow > 0:
+            self.positions.extend([-1] * grow)
+
+    def missing(self, positions):
+        """(sentences, positions) of the given triples whose sentence has no embedding yet."""
+        sentences, owners, seen = [], [], set()
+        for pos, sentence in zip(positions, self.sentences(positions)):
+            if sentence not in self.vectors and sentence not in seen:
+                seen.add(sentence)
+                sentences.append(sentence)
+                owners.append(pos)
+        return sentences, owners
+
+    def link(self, positions, sentences=None):
+        """Point rows that have no triple yet at the given positions (after restores and syncs)."""
+        if sentences is None:
+            sentences = self.sentences(positions)
+        self._grow()
+        revived = []
+        for pos, sentence in zip(positions, sentences):
+            row = self.vectors.row_of.get(sentence)
+            if row is not None and self.positions[row] < 0:
+                self.positions[row] = pos
+                revived.append(sentence)
+        self.vectors.revive(revived)
+
+    def unlink(self, positions, sentences):
+        """Detach deleted triples from their rows; the rows are retired until relinked or compacted."""
+        retired = []
+        for pos, sentence in zip(positions, sentences):
+            row = self.vectors.row_of.get(sentence)
+            if row is not None and self.positions[row] == pos:
+                self.positions[row] = -1
+                retired.append(sentence)
+        self.vectors.retire(retired)
+
+    def retire_unlinked(self):
+        self._grow()
+        self.vectors.retire([s for s, pos in zip(self.vectors.nodes, self.positions) if pos < 0])
+
+    def remap_positions(self, remap):
+        """Follow a TripleStore compaction."""
+        new_pos = remap.tolist()
+        self.positions = array("q", [new_pos[p] if p >= 0 else -1 for p in self.positions])
+
+    def compact(self):
+        """Drop retired sentence rows and renumber the indexes."""
+        self._grow()
+        remap = self.vectors.compact()
+        keep = np.frombuffer(self.positions, dtype=np.int64)[remap >= 0]
+        self.positions = array("q", keep.tobytes())
+        for index in self.indexes.values():
+            index.remap(remap)
+
+    def add_encoded(self, sentences, embs, positions=()):
+        """Append precomputed sentence rows and index them (caller holds STORE_LOCK.write())."""
+        rows = self.vectors.add_encoded(sentences, embs) if len(sentences) else []
+        self.link(positions, sentences[:len(positions)])
+        for index in self.indexes.values():
+            index.add(rows)
+        return rows
+
+    def search(self, query_emb, k, index="ivf", nprobe=None):
+        """Top-k triples for a query embedding, as (positions, scores)."""
+        rows, scores = self.indexes[index].search(query_emb, k, nprobe=nprobe)
+        keep = [i for i, r in enumerate(rows.tolist()) if self.positions[r] >= 0]
+        return [self.positions[rows[i]] for i in keep], scores[keep]
+
+EDGE_INDEX = (EdgeIndex(semantic_search_data, nprobe=int(os.environ.get("SEARCH_NPROBE", 8)))
+              if os.environ.get("EDGE_INDEX", "1") == "1" else None)
+
+def embed_new_edges(positions):
+    """Encode and index the sentences of triples that have no edge embedding yet."""
+    if EDGE_INDEX is None:
+        return []
+    with STORE_LOCK.read():
+        sentences, owners = EDGE_INDEX.missing(positions)
+    if not sentences:
+        return []
+    embs = EDGE_INDEX.vectors.encode(sentences)
+    with STORE_LOCK.write():
+        return EDGE_INDEX.add_encoded(sentences, embs, owners)
+
+class ChangeFeed:
+    """Global version counter with per-topic "last changed at" versions.
+
+    Writers call ``bump(topic, ...)``; the /events stream blocks in ``wait()``
+    and only pushes the topics whose version moved since it last sent them.
+    """
+    TOPICS = ("stats", "triples", "metrics")
+
+    def __init__(self):
+        self.version = 0
+        self.topic_versions = {t: 0 for t in self.TOPICS}
+        self._cond = threading.Condition()
+
+    def bump(self, *topics):
+        with self._cond:
+            self.version += 1
+            for t in topics:
+                self.topic_versions[t] = self.version
+            self._cond.notify_all()
+
+    def wait(self, since, timeout):
+        """Block until the version exceeds since (or timeout); returns (version, topic versions)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since, timeout=timeout)
+            return self.version, dict(self.topic_versions)
+
+CHANGES = ChangeFeed()
+
+# processed-item counts per time bucket, behind the dashboard chart
+PROCESSING_ACTIVITY = TimeBuckets(int(os.environ.get("METRICS_BUCKET_S", 3600)),
+                                  int(os.environ.get("METRICS_BUCKETS", 168)))
 def bump_processing_count(n=1):
-    """Increment today's daily counter by n (UTC weekday: 0=Mon .. 6=Sun)."""
-    wd = datetime.utcnow().weekday()
-    PROCESSING_DAILY[wd] = PROCESSING_DAILY.get(wd, 0) + int(n)
+    """Add n processed items to the current time bucket."""
+    bucket = PROCESSING_ACTIVITY.bucket_id()
+    with STATS_LOCK:
+        PROCESSING_ACTIVITY.set(bucket, int(n), add=True)
+    if SNAPSHOT is not None and SNAPSHOT.shared:
+        SNAPSHOT.incr_counter(f"processed:{bucket}", int(n))
+    CHANGES.bump("metrics")
+
+# -------------------------
+# Streaming ingestion
+# -------------------------
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 5000))
+
+def iter_csv_batches(binary_stream, counters, batch_size=INGEST_BATCH_SIZE):
+    """Decode a CSV byte stream incrementally and yield lists of at most batch_size triples.
+
+    Only one batch of rows is held at a time. ``counters`` is updated in place
+    with rows_read and rows_skipped (short, empty or unparseable rows).
+    """
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from _csv_row_batches(csv.reader(text), counters, batch_size)
+    finally:
+        text.detach()  # leave the caller's stream open
+
+def _csv_row_batches(reader, counters, batch_size):
+    batch = []
+    clock = time.perf_counter
+    started = clock()
+    decode = 0.0  # time inside the decoder/csv.reader; the rest of the batch is parsing
+    while True:
+        t0 = clock()
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error:
+            counters["rows_read"] += 1
+            counters["rows_skipped"] += 1
+            continue
+        finally:
+            decode += clock() - t0
+        counters["rows_read"] += 1
+        if len(row) < 3:
+            counters["rows_skipped"] += 1
+            continue
+        subj, rel, obj = row[0].strip(), row[1].strip(), row[2].strip()
+        if not (subj and rel and obj):
+            counters["rows_skipped"] += 1
+            continue
+        batch.append({"subject": subj, "relation": rel, "object": obj, "type_subject": None, "type_object": None})
+        if len(batch) >= batch_size:
+            STAGE_TIMINGS.observe("csv_decode", decode)
+            STAGE_TIMINGS.observe("parse", clock() - started - decode)
+            yield batch
+            batch = []
+            started, decode = clock(), 0.0
+    STAGE_TIMINGS.observe("csv_decode", decode)
+    STAGE_TIMINGS.observe("parse", clock() - started - decode)
+    if batch:
+        yield batch
+
+TRIPLE_COLUMNS = ("subject", "relation", "object", "type_subject", "type_object")
+
+def _triple_from_values(subj, rel, obj, type_subject=None, type_object=None):
+    """Normalised triple dict, or None when a required field is missing or blank."""
+    subj, rel, obj = (str(v).strip() if v is not None else "" for v in (subj, rel, obj))
+    if not (subj and rel and obj):
+        return None
+    return {"subject": subj, "relation": rel, "object": obj,
+            "type_subject": type_subject or None, "type_object": type_object or None}
+
+def iter_ndjson_batches(binary_stream, counters, batch_size=INGEST_BATCH_SIZE):
+    """Yield triple batches from NDJSON: one object (subject/relation/object[/type_*]) or [s, r, o] per line."""
+    batch = []
+    started = time.perf_counter()
+    for line in binary_stream:
+        if not line.strip():
+            continue
+        counters["rows_read"] += 1
+        try:
+            rec = json.loads(line)
+            if isinstance(rec, dict):
+                triple = _triple_from_values(*(rec.get(c) for c in TRIPLE_COLUMNS))
+            elif isinstance(rec, list):
+                triple = _triple_from_values(*rec[:5])
+            else:
+                triple = None  # a bare string would otherwise be sliced into characters
+        except (ValueError, TypeError, IndexError, KeyError):
+            triple = None
+        if triple is None:
+            counters["rows_skipped"] += 1
+            continue
+        batch.append(triple)
+        if len(batch) >= batch_size:
+            STAGE_TIMINGS.observe("parse", time.perf_counter() - started)
+            yield batch
+            batch = []
+            started = time.perf_counter()
+    STAGE_TIMINGS.observe("parse", time.perf_counter() - started)
+    if batch:
+        yield batch
+
+def optional_pyarrow():
+    """pyarrow (with its parquet and ipc modules) if installed, else None."""
+    try:
+        import pyarrow, pyarrow.ipc, pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+def iter_arrow_batches(path, fmt, counters, batch_size=INGEST_BATCH_SIZE):
+    """Yield triple batches from a Parquet or Arrow IPC file, one record batch at a time.
+
+    Columns are converted to Python lists per batch (columnar, no per-row
+    parsing); the whole table is never loaded.
+    """
+    pa = optional_pyarrow()
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow import needs pyarrow (pip install pyarrow)")
+    if fmt == "parquet":
+        source = pa.parquet.ParquetFile(path)
+        counters["rows_total"] = source.metadata.num_rows
+        names = source.schema_arrow.names
+        columns = [c for c in TRIPLE_COLUMNS if c in names]
+        record_batches = source.iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        source = pa.ipc.open_file(pa.memory_map(path))
+        counters["rows_total"] = sum(source.get_batch(i).num_rows for i in range(source.num_record_batches))
+        record_batches = (source.get_batch(i) for i in range(source.num_record_batches))
+    for rb in record_batches:
+        with STAGE_TIMINGS.time("parse"):
+            cols = {name: rb.column(i).to_pylist() for i, name in enumerate(rb.schema.names)}
+            missing = [c for c in TRIPLE_COLUMNS[:3] if c not in cols]
+            if missing:
+                raise ValueError("missing columns: " + ", ".join(missing))
+            empty = [None] * rb.num_rows
+            batch = []
+            for values in zip(*(cols.get(c, empty) for c in TRIPLE_COLUMNS)):
+                triple = _triple_from_values(*values)
+                if triple is None:
+                    counters["rows_skipped"] += 1
+                else:
+                    batch.append(triple)
+            counters["rows_read"] += rb.num_rows
+        for i in range(0, len(batch), batch_size):
+            yield batch[i:i + batch_size]
+
+IMPORT_FORMATS = ("csv", "ndjson", "parquet", "arrow")
+
+def detect_import_format(filename, head=b""):
+    """(format, gzipped) from the file name, falling back to the gzip magic bytes."""
+    name = (filename or "").lower()
+    gzipped = name.endswith(".gz") or head[:2] == b"\x1f\x8b"
+    if name.endswith(".gz"):
+        name = name[:-3]
+    ext = name.rsplit(".", 1)[-1] if "." in name else ""
+    fmt = {"jsonl": "ndjson", "ndjson": "ndjson", "json": "ndjson", "parquet": "parquet", "pq": "parquet",
+           "arrow": "arrow", "feather": "arrow", "ipc": "arrow"}.get(ext, "csv")
+    return fmt, gzipped
+
+# serialises ingest writers (uploads, analyses, shared-store sync)
+INGEST_LOCK = threading.Lock()
+
+def commit_triples(triples, source=None, upsert=False):
+    """Insert triples, embed their new nodes and sentences, persist them.
+
+    Returns (new positions, duplicates, updated positions). With ``upsert`` an
+    existing triple takes the given types (and is returned as updated when
+    they differ) instead of being skipped. ``source`` records the file the
+    triples came from, for sync uploads. The store's write lock is held only
+    for the in-memory mutations, not while the model encodes, so searches keep
+    running during ingest.
+    """
+    store = semantic_search_data
+    with INGEST_LOCK:
+        with STORE_LOCK.write(), STAGE_TIMINGS.time("dedupe"):
+            if upsert:
+                new_positions, updated = store.upsert_many(triples, source)
+                duplicates = len(triples) - len(new_positions) - len(updated)
+            else:
+                (new_positions, duplicates), updated = store.add_many(triples, source), []
+            if updated:
+                store.generation += 1  # type changes are complete as of now
+            if new_positions and (NODE_EMBEDDINGS.retired or (EDGE_INDEX is not None and EDGE_INDEX.vectors.retired)):
+                # re-added nodes and triples get their retired embeddings back, no re-encoding
+                NODE_EMBEDDINGS.revive(store.node_names(new_positions))
+                if EDGE_INDEX is not None:
+                    EDGE_INDEX.link(new_positions)
+        if updated and SNAPSHOT is not None:
+            SNAPSHOT.update_triples(store, updated)
+        if not new_positions:
+            if updated:
+                CHANGES.bump("triples")
+            return new_positions, duplicates, updated
+        new_nodes = NODE_EMBEDDINGS.missing(semantic_search_data.node_names(new_positions))
+        sentences, owners = EDGE_INDEX.missing(new_positions) if EDGE_INDEX is not None else ([], [])
+        # one batched model call for new nodes and new triple sentences
+        texts = new_nodes + sentences
+        embs = NODE_EMBEDDINGS.encode(texts) if texts else None
+        node_embs, edge_embs = (embs[:len(new_nodes)], embs[len(new_nodes):]) if texts else (None, None)
+        with STORE_LOCK.write():
+            rows = NODE_EMBEDDINGS.add_encoded(new_nodes, node_embs) if new_nodes else []
+            index_new_rows(rows)
+            if sentences:
+                EDGE_INDEX.add_encoded(sentences, edge_embs, owners)
+            store.generation += 1  # only now are the new triples searchable
+        if SNAPSHOT is not None:
+            SNAPSHOT.append_triples(store, new_positions, new_nodes, node_embs, sentences, edge_embs)
+    CHANGES.bump("stats", "triples")
+    return new_positions, duplicates, updated
+
+def ingest_batches(batches, counters, on_batch=None, source=None, upsert=False):
+    """Commit each batch to the store (dedupe + node and edge embeddings) as soon as it is parsed."""
+    for batch in batches:
+        new_positions, duplicates, updated = commit_triples(batch, source, upsert)
+        counters["triples_added"] += len(new_positions)
+        counters["triples_updated"] += len(updated)
+        counters["duplicates"] += duplicates
+        counters["batches"] += 1
+        if on_batch is not None:
+            on_batch()
+    return counters
+
+def new_ingest_counters():
+    return {"rows_read": 0, "rows_skipped": 0, "triples_added": 0, "triples_updated": 0, "duplicates": 0,
+            "batches": 0}
+
+# -------------------------
+# Deletion & compaction
+# -------------------------
+COMPACT_RATIO = float(os.environ.get("COMPACT_RATIO", 0.2))  # tombstoned share that triggers a compaction
+COMPACT_MIN = int(os.environ.get("COMPACT_MIN", 10000))       # ...once there are at least this many
+OPEN_CURSORS = set()  # position-based readers (exports); compaction waits for them
+
+def delete_triples(select):
+    """Tombstone the positions ``select(store)`` returns and retire the embeddings only they used.
+
+    ``select`` runs under the ingest and write locks, so the positions cannot
+    move underneath it. Node and sentence rows are kept (a re-added triple
+    reuses them) until compact_store() drops them. Returns the deleted triples.
+    """
+    with INGEST_LOCK:
+        triples = tombstone_triples(select)
+        if triples and SNAPSHOT is not None:
+            SNAPSHOT.delete_triples(triples)
+    if triples:
+        recalc_node_counts()
+        CHANGES.bump("stats", "triples")
+    return triples
+
+def tombstone_triples(select):
+    """In-memory half of delete_triples() (caller holds INGEST_LOCK; nothing is persisted)."""
+    store = semantic_search_data
+    with STORE_LOCK.write():
+        removed, orphans = store.delete_many(select(store))
+        triples = store.triples_at(removed)
+        NODE_EMBEDDINGS.retire(orphans)
+        if EDGE_INDEX is not None:
+            EDGE_INDEX.unlink(removed, [triple_sentence(t) for t in triples])
+    return triples
+
+def _over_threshold(dead, total, force):
+    return dead > 0 and (force or dead >= max(COMPACT_MIN, COMPACT_RATIO * total))
+
+def _compaction_due(force):
+    """Whether any part of the store is past its compaction threshold (lock-free reads, re-checked under the lock)."""
+    store = semantic_search_data
+    return (_over_threshold(store.n_deleted, len(store), force)
+            or _over_threshold(len(NODE_EMBEDDINGS.retired), len(NODE_EMBEDDINGS), force)
+            or (EDGE_INDEX is not None and _over_threshold(len(EDGE_INDEX.vectors.retired), len(EDGE_INDEX), force)))
+
+def compact_store(force=False):
+    """Drop tombstoned triples and retired node/sentence rows past COMPACT_RATIO (all of them with force).
+
+    Positions and rows are renumbered in order and every index is remapped in
+    place (IVF lists, trigram postings, prefix lists, edge positions); nothing
+    is re-encoded or retrained. Returns what was dropped.
+    """
+    store, out = semantic_search_data, {}
+    if not _compaction_due(force):
+        return out  # the common case on every maintenance tick: no locks taken
+    with INGEST_LOCK:
+        with STORE_LOCK.write():
+            # checked under the write lock: exports register under the read lock
+            if OPEN_CURSORS:
+                return {"deferred": "export in progress"}
+            if _over_threshold(store.n_deleted, len(store), force):
+                out["triples"] = store.n_deleted
+                remap = store.compact()
+                if EDGE_INDEX is not None:
+                    EDGE_INDEX.remap_positions(remap)
+            if _over_threshold(len(NODE_EMBEDDINGS.retired), len(NODE_EMBEDDINGS), force):
+                out["node_rows"] = len(NODE_EMBEDDINGS.retired)
+                remap = NODE_EMBEDDINGS.compact()
+                for index in VECTOR_INDEXES.values():
+                    index.remap(remap)
+                LEXICAL_INDEX.remap(remap)
+            if EDGE_INDEX is not None and _over_threshold(len(EDGE_INDEX.vectors.retired), len(EDGE_INDEX), force):
+                out["edge_rows"] = len(EDGE_INDEX.vectors.retired)
+                EDGE_INDEX.compact()
+        if out and SNAPSHOT is not None:
+            SNAPSHOT.compact(nodes="node_rows" in out, edges="edge_rows" in out)
+    return out
+
+# -------------------------
+# Background ingestion jobs
+# -------------------------
+class Job:
+    """State of one background ingestion job, as reported by /jobs/<id>."""
+
+    def __init__(self, kind, name=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.state = "queued"  # queued -> running -> done | failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.rows_processed = 0
+        self.bytes_total = None
+        self.bytes_processed = 0
+        self.errors = []
+        self.result = None
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        elapsed = (end - self.started) if self.started else 0.0
+        out = {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed_s": round(elapsed, 3),
+            "rows_processed": self.rows_processed,
+            "rows_per_s": round(self.rows_processed / elapsed, 1) if elapsed > 0 else None,
+            "bytes_total": self.bytes_total,
+            "bytes_processed": self.bytes_processed,
+            "progress": None,
+            "errors": self.errors,
+            "result": self.result,
+        }
+        if self.state == "done":
+            out["progress"] = 1.0
+        elif self.bytes_total:
+            out["progress"] = round(min(1.0, self.bytes_processed / self.bytes_total), 4)
+        return out
+
+class JobManager:
+    """Fixed worker pool fed by a bounded queue; submit() raises queue.Full when saturated."""
+
+    def __init__(self, workers=2, max_queued=8, keep_finished=500):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.jobs = OrderedDict()  # id -> Job, oldest first
+        self.keep_finished = keep_finished
+        self.lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def has_capacity(self):
+        return not self.queue.full()
+
+    def submit(self, kind, fn, name=None, bytes_total=None):
+        """Queue fn(job) to run on a worker and return the Job immediately."""
+        job = Job(kind, name)
+        job.bytes_total = bytes_total
+        with self.lock:
+            self._ensure_workers()
+            self.queue.put_nowait((job, fn))  # raises queue.Full -> backpressure
+            self.jobs[job.id] = job
+            self._prune()
+        CHANGES.bump("stats")  # processing_jobs changed
+        return job
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.state in ("done", "failed")]
+        for j in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[j.id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def active_count(self):
+        with self.lock:
+            return sum(1 for j in self.jobs.values() if j.state in ("queued", "running"))
+
+    def _work(self):
+        while True:
+            job, fn = self.queue.get()
+            job.state = "running"
+            job.started = time.time()
+            try:
+                job.result = fn(job)
+                job.state = "done"
+            except Exception as e:
+                job.errors.append(str(e))
+                job.state = "failed"
+            finally:
+                job.finished = time.time()
+                self.queue.task_done()
+                CHANGES.bump("stats")
+
+JOBS = JobManager(workers=int(os.environ.get("JOB_WORKERS", 2)),
+                  max_queued=int(os.environ.get("JOB_QUEUE_SIZE", 8)))
+JOB_RETRY_AFTER_S = 5
+
+def queue_full_response():
+    resp = jsonify({"error": "ingestion queue is full, retry later"})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(JOB_RETRY_AFTER_S)
+    return resp
+
+def job_accepted_response(job):
+    return jsonify({"job_id": job.id, "state": job.state, "status_url": f"/jobs/{job.id}"}), 202
+
+# -------------------------
+# Text -> triples extraction (spaCy dependency parse + entities)
+# -------------------------
+# extraction only reads the dependency parse and entity spans, so the tagger,
+# attribute ruler and lemmatizer are skipped (relations use the surface form)
+EXTRACTION_PIPES = ("tok2vec", "parser", "ner")
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", 64))
+
+SUBJECT_DEPS = {"nsubj", "nsubjpass", "csubj"}
+OBJECT_DEPS = {"dobj", "attr", "oprd", "dative"}
+MODIFIER_DEPS = {"compound", "amod", "nummod", "poss", "nmod", "quantmod"}
+
+def extraction_disabled_pipes():
+    return [name for name in NLP_MODEL.get().pipe_names if name not in EXTRACTION_PIPES]
+
+def _phrase(tok, ents_by_token):
+    """Text and entity label of the noun phrase headed by tok."""
+    ent = ents_by_token.get(tok.i)
+    if ent is not None:
+        return ent.text, ent.label_
+    doc = tok.doc
+    start, end = tok.i, tok.i + 1
+    for child in tok.lefts:
+        if child.dep_ in MODIFIER_DEPS:
+            start = min(start, child.left_edge.i)
+    for child in tok.rights:
+        # keep "of"-attachments: "theory of relativity"
+        if child.dep_ == "prep" and child.lower_ == "of":
+            end = max(end, child.right_edge.i + 1)
+    return doc[start:end].text, None
+
+def _with_conjuncts(tok):
+    out = [tok]
+    for child in tok.children:
+        if child.dep_ == "conj":
+            out.extend(_with_conjuncts(child))
+    return out
+
+def _subjects(verb):
+    subs = [c for c in verb.children if c.dep_ in SUBJECT_DEPS]
+    if not subs and verb.dep_ == "conj" and verb.head is not verb:
+        # "born in Ulm and died in Princeton" -> died inherits born's subject
+        return _subjects(verb.head)
+    return [s for sub in subs for s in _with_conjuncts(sub)]
+
+def extract_triples(doc):
+    """Derive (subject, relation, object) triples from a parsed spaCy Doc."""
+    ents_by_token = {i: ent for ent in doc.ents for i in range(ent.start, ent.end)}
+    triples, seen = [], set()
+    def emit(subj, rel, obj):
+        s_text, s_type = _phrase(subj, ents_by_token)
+        o_text, o_type = _phrase(obj, ents_by_token)
+        key = (s_text, rel, o_text)
+        if s_text and o_text and s_text != o_text and key not in seen:
+            seen.add(key)
+            triples.append({"subject": s_text, "relation": rel, "object": o_text,
+                            "type_subject": s_type, "type_object": o_type})
+    for verb in doc:
+        subjects = _subjects(verb)
+        if not subjects:
+            continue
+        rel = verb.lower_
+        particles = [c.lower_ for c in verb.children if c.dep_ == "prt"]
+        if particles:
+            rel += "_" + "_".join(particles)
+        for child in verb.children:
+            if child.dep_ in OBJECT_DEPS:
+                for obj in _with_conjuncts(child):
+                    for subj in subjects:
+                        emit(subj, rel, obj)
+            elif child.dep_ in ("prep", "agent"):
+                for pobj in (c for c in child.children if c.dep_ == "pobj"):
+                    for obj in _with_conjuncts(pobj):
+                        for subj in subjects:
+                            emit(subj, rel + "_" + child.lower_, obj)
+    return triples
+
+def extract_corpus(texts, batch_size=NLP_BATCH_SIZE, n_process=1):
+    """Stream texts through nlp.pipe with the trimmed pipeline; yields one triple list per text."""
+    docs = iter(NLP_MODEL.get().pipe(texts, batch_size=batch_size, n_process=n_process,
+                                     disable=extraction_disabled_pipes()))
+    while True:
+        with STAGE_TIMINGS.time("spacy"):  # amortised: pipe() parses a whole batch per refill
+            doc = next(docs, None)
+        if doc is None:
+            return
+        with STAGE_TIMINGS.time("extract"):
+            triples = extract_triples(doc)
+        yield triples
+
+# -------------------------
+# Graph statistics (background refresh)
+# -------------------------
+class GraphStatsRefresher:
+    """Recomputes the O(nodes) parts of the graph stats (top hubs, relation
+    frequency) on a background thread whenever the store generation moves, so
+    the /stats handler only ever reads a cached dict. The same thread rebuilds
+    the component count after deletions and runs ``maintenance`` (compaction)
+    every tick."""
+
+    def __init__(self, store, interval=10, top_n=10, maintenance=None):
+        self.store = store
+        self.interval = interval
+        self.top_n = top_n
+        self.maintenance = maintenance
+        self.generation = -1
+        self.result = {"top_hubs": [], "top_relations": [], "computed_at": None}
+        self._thread = None
+
+    def refresh(self):
+        store = self.store
+        generation = store.generation
+        if store.components_stale:
+            store.rebuild_components(STORE_LOCK.read, STORE_LOCK.write)
+        with STORE_LOCK.read():  # brief copy so writers can keep appending
+            refs = np.array(store.node_refs, dtype=np.int64)
+            rel_counts = np.array(store.relation_counts, dtype=np.int64)
+        hubs = top_k_indices(refs, self.top_n) if len(refs) else []
+        rels = top_k_indices(rel_counts, self.top_n) if len(rel_counts) else []
+        self.result = {
+            "top_hubs": [{"node": store.nodes[int(i)], "degree": int(refs[i])} for i in hubs if refs[i] > 0],
+            "top_relations": [{"relation": store.relations[int(i)], "triples": int(rel_counts[i])}
+                              for i in rels if rel_counts[i] > 0],
+            "computed_at": time.time(),
+        }
+        self.generation = generation
+        return self.result
+
+    def _run(self):
+        while True:
+            try:
+                if self.maintenance is not None:
+                    self.maintenance()
+                if self.store.generation != self.generation:
+                    self.refresh()
+            except Exception:
+                app.logger.exception("graph stats refresh failed (retried on the next tick)")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="graph-stats", daemon=True)
+            self._thread.start()
+
+GRAPH_STATS = GraphStatsRefresher(semantic_search_data, interval=float(os.environ.get("GRAPH_STATS_INTERVAL_S", 10)),
+                                  maintenance=compact_store)
+GRAPH_STATS.start()
+
+# -------------------------
+# Persistence (snapshot / restore)
+# -------------------------
+class Snapshot:
+    """On-disk state: an SQLite triple log plus memory-mapped embedding matrices.
+
+    Triples are appended to ``triples.sqlite`` as they are ingested, so nothing
+    is lost between snapshots. ``save()`` writes the node (and edge-sentence)
+    embeddings to new ``.npy`` files and switches to them in the same SQLite
+    transaction that records their row order; ``restore()`` opens them with
+    ``np.load(mmap_mode="r")``, so a restarted process is searchable without
+    re-running the model and workers on one host share pages.
+
+    In shared mode (several worker processes on one directory) each commit also
+    writes its new vectors, counters are kept in SQLite, and ``sync()`` tails
+    the log so every worker converges on the same graph without re-encoding
+    what another worker already embedded.
+    """
+    # space -> (row-order table, key column, shared vectors table, meta key of the .npy, file prefix)
+    SPACES = {
+        "nodes": ("nodes", "node", "node_embeddings", "embeddings_file", "embeddings"),
+        "edges": ("edges", "sentence", "edge_embeddings", "edge_embeddings_file", "edges"),
+    }
+
+    def __init__(self, directory, shared=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shared = shared
+        self.db_path = os.path.join(directory, "triples.sqlite")
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS triples (id INTEGER PRIMARY KEY, subject TEXT NOT NULL, "
+                              "relation TEXT NOT NULL, object TEXT NOT NULL, type_subject TEXT, type_object TEXT, "
+                              "source TEXT, deleted INTEGER NOT NULL DEFAULT 0)")
+            columns = {r[1] for r in self.conn.execute("PRAGMA table_info(triples)")}
+            if "deleted" not in columns:  # snapshots from before deletes existed
+                self.conn.execute("ALTER TABLE triples ADD COLUMN source TEXT")
+                self.conn.execute("ALTER TABLE triples ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+            # unique among live rows only: a deleted triple can be added again (with a new, higher id)
+            self.conn.execute("DROP INDEX IF EXISTS triples_spo")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS triples_live_spo ON triples (subject, relation, object) "
+                              "WHERE deleted = 0")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS deletions (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                              "subject TEXT NOT NULL, relation TEXT NOT NULL, object TEXT NOT NULL)")
+            for table, column, vectors, _, _ in self.SPACES.values():
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (row INTEGER PRIMARY KEY, {column} TEXT NOT NULL)")
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {vectors} ({column} TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS feedback (id INTEGER PRIMARY KEY, rating INTEGER NOT NULL)")
+        self.last_saved = None
+        self.saved_rows = {space: 0 for space in self.SPACES}
+        self.synced_triple_id = 0
+        self.synced_vector_ids = {space: 0 for space in self.SPACES}
+        self.synced_feedback_id = 0
+        self.synced_deletion_id = 0
+        self.own_deletions = set()  # deletion log ids this worker wrote (already applied here)
+
+    @staticmethod
+    def _vectors(space):
+        if space == "nodes":
+            return NODE_EMBEDDINGS
+        return EDGE_INDEX.vectors if EDGE_INDEX is not None else None
+
+    @staticmethod
+    def _index(space, rows, keys=None, embs=None):
+        """Add rows to the space's search indexes, appending (keys, embs) first when given."""
+        if space == "nodes":
+            if keys is not None:
+                rows = NODE_EMBEDDINGS.add_encoded(keys, embs)
+            index_new_rows(rows)
+        elif keys is not None:
+            rows = EDGE_INDEX.add_encoded(keys, embs)
+        else:
+            for index in EDGE_INDEX.indexes.values():
+                index.add(rows)
+        return rows
+
+    def unsaved(self):
+        return any(len(self._vectors(space)) != self.saved_rows[space] for space in self._spaces())
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def append_triples(self, store, positions, nodes=(), node_embs=None, sentences=(), edge_embs=None):
+        """Log committed triples (and, in shared mode, their new vectors) in one transaction."""
+        rows = []
+        for pos, t in zip(positions, store.triples_at(positions)):
+            rows.append((t["subject"], t["relation"], t["object"], t["type_subject"], t["type_object"],
+                         store.sources[store.src[pos]]))
+        with self.lock, self.conn:
+            if self.shared:
+                # vectors first: a worker that sees a triple also sees its embeddings
+                for space, keys, embs in (("nodes", nodes, node_embs), ("edges", sentences, edge_embs)):
+                    _, column, table, _, _ = self.SPACES[space]
+                    if len(keys):
+                        self.conn.executemany(f"INSERT OR IGNORE INTO {table} ({column}, vec) VALUES (?, ?)",
+                                              ((k, embs[i].tobytes()) for i, k in enumerate(keys)))
+            self.conn.executemany("INSERT OR IGNORE INTO triples (subject, relation, object, type_subject, "
+                                  "type_object, source) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _tombstone(self, triples):
+        """Mark the live rows of triples deleted; in shared mode log them for the other workers (holds self.lock)."""
+        keys = [(t["subject"], t["relation"], t["object"]) for t in triples]
+        self.conn.executemany("UPDATE triples SET deleted = 1 WHERE subject = ? AND relation = ? AND object = ? "
+                              "AND deleted = 0", keys)
+        if self.shared:
+            for key in keys:
+                cur = self.conn.execute("INSERT INTO deletions (subject, relation, object) VALUES (?, ?, ?)", key)
+                self.own_deletions.add(cur.lastrowid)
+
+    def delete_triples(self, triples):
+        with self.lock, self.conn:
+            self._tombstone(triples)
+
+    def update_triples(self, store, positions):
+        """Persist new types of existing triples (shared mode: as delete + re-insert, so other workers see it)."""
+        triples = store.triples_at(positions)
+        with self.lock, self.conn:
+            if not self.shared:
+                self.conn.executemany("UPDATE triples SET type_subject = ?, type_object = ? WHERE subject = ? AND "
+                                      "relation = ? AND object = ? AND deleted = 0",
+                                      ((t["type_subject"], t["type_object"], t["subject"], t["relation"], t["object"])
+                                       for t in triples))
+                return
+            self._tombstone(triples)
+            self.conn.executemany("INSERT OR IGNORE INTO triples (subject, relation, object, type_subject, "
+                                  "type_object, source) VALUES (?, ?, ?, ?, ?, ?)",
+                                  ((t["subject"], t["relation"], t["object"], t["type_subject"], t["type_object"],
+                                    store.sources[store.src[pos]]) for pos, t in zip(positions, triples)))
+
+    def compact(self, nodes=False, edges=False):
+        """Purge tombstoned rows (never the newest id, which SQLite would hand out again) and
+        make the next save() rewrite vector files whose rows compact_store() renumbered."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM triples WHERE deleted = 1 AND id < (SELECT MAX(id) FROM triples)")
+            for space, changed in (("nodes", nodes), ("edges", edges)):
+                if changed:
+                    self.saved_rows[space] = None
+
+    def incr_counter(self, key, n):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO counters (key, value) VALUES (?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (key, n))
+
+    def set_state(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              ("state:" + key, json.dumps(value)))
+
+    def add_feedback(self, rating):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO feedback (rating) VALUES (?)", (rating,))
+
+    def save(self):
+        """Write each embedding matrix to a fresh .npy and atomically point the snapshot at it."""
+        matrices = {}
+        with STORE_LOCK.read():
+            for space in self.SPACES:
+                vectors = self._vectors(space)
+                if vectors is not None and len(vectors):
+                    n = len(vectors)
+                    matrices[space] = (vectors.nodes[:n], np.array(vectors.matrix()[:n], dtype=np.float32))
+        with STATS_LOCK:
+            meta = {"stats": STATS, "feedback": FEEDBACK, "processing_activity": PROCESSING_ACTIVITY.to_dict()}
+            meta = {k: json.dumps(v) for k, v in meta.items()}
+        with self.lock:
+            for space, (keys, matrix) in matrices.items():
+                if len(keys) == self.saved_rows[space]:
+                    continue
+                table, column, _, meta_key, prefix = self.SPACES[space]
+                old = self._meta(meta_key)
+                name = f"{prefix}-{uuid.uuid4().hex[:8]}.npy"
+                np.save(os.path.join(self.directory, name), matrix)
+                with self.conn:
+                    self.conn.execute(f"DELETE FROM {table}")
+                    self.conn.executemany(f"INSERT INTO {table} (row, {column}) VALUES (?, ?)", enumerate(keys))
+                    self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                      (meta_key, json.dumps(name)))
+                if old and old != name:
+                    # processes that already mapped the old file keep their inode
+                    try:
+                        os.unlink(os.path.join(self.directory, old))
+                    except OSError:
+                        pass
+                self.saved_rows[space] = len(keys)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+            self.last_saved = time.time()
+        return {"embeddings": self.saved_rows["nodes"], "edge_embeddings": self.saved_rows["edges"],
+                "saved_at": self.last_saved}
+
+    def _load_triples(self, chunk=50000):
+        """Apply logged triples newer than synced_triple_id; returns the new positions."""
+        keys = ("subject", "relation", "object", "type_subject", "type_object")
+        added = []
+        while True:
+            with self.lock:
+                rows = self.conn.execute("SELECT id, subject, relation, object, type_subject, type_object, source "
+                                         "FROM triples WHERE id > ? AND deleted = 0 ORDER BY id LIMIT ?",
+                                         (self.synced_triple_id, chunk)).fetchall()
+            if not rows:
+                return added
+            with STORE_LOCK.write():
+                start = 0
+                for i in range(1, len(rows) + 1):  # one add_many per run of rows from the same source
+                    if i == len(rows) or rows[i][6] != rows[start][6]:
+                        positions, _ = semantic_search_data.add_many((dict(zip(keys, r[1:6])) for r in rows[start:i]),
+                                                                     rows[start][6])
+                        added.extend(positions)
+                        start = i
+            self.synced_triple_id = rows[-1][0]
+
+    def _load_deletions(self):
+        """Shared mode: tombstone what other workers deleted (caller holds INGEST_LOCK); returns how many."""
+        with self.lock:
+            rows = self.conn.execute("SELECT id, subject, relation, object FROM deletions WHERE id > ? ORDER BY id",
+                                     (self.synced_deletion_id,)).fetchall()
+            # a live row this worker has already read means the triple was added again after the delete
+            keys = [r[1:] for r in rows if r[0] not in self.own_deletions and not self.conn.execute(
+                "SELECT 1 FROM triples WHERE subject = ? AND relation = ? AND object = ? AND deleted = 0 AND id <= ?",
+                (*r[1:], self.synced_triple_id)).fetchone()]
+        if not rows:
+            return 0
+        self.synced_deletion_id = rows[-1][0]
+        self.own_deletions -= {r[0] for r in rows}
+        if not keys:
+            return 0
+        return len(tombstone_triples(lambda store: [p for p in (store.find(*k) for k in keys) if p is not None]))
+
+    def _load_matrix(self, space):
+        """Memory-map the space's last saved .npy and index its rows."""
+        table, column, _, meta_key, _ = self.SPACES[space]
+        name = self._meta(meta_key)
+        path = os.path.join(self.directory, name) if name else None
+        if not path or not os.path.exists(path):
+            return
+        matrix = np.load(path, mmap_mode="r")
+        keys = [r[0] for r in self.conn.execute(f"SELECT {column} FROM {table} ORDER BY row")]
+        n = min(len(matrix), len(keys))
+        self._vectors(space).load(keys[:n], matrix[:n])
+        self.saved_rows[space] = n
+        self._index(space, np.arange(n))
+
+    def _load_shared_vectors(self, space, chunk=20000):
+        """Adopt vectors other workers already computed; returns the new rows."""
+        _, column, table, _, _ = self.SPACES[space]
+        added = []
+        while True:
+            with self.lock:
+                rows = self.conn.execute(f"SELECT rowid, {column}, vec FROM {table} WHERE rowid > ? "
+                                         "ORDER BY rowid LIMIT ?", (self.synced_vector_ids[space], chunk)).fetchall()
+            if not rows:
+                return added
+            embs = np.frombuffer(b"".join(r[2] for r in rows), dtype=np.float32).reshape(len(rows), -1)
+            with STORE_LOCK.write():
+                added.extend(self._index(space, None, [r[1] for r in rows], embs))
+            self.synced_vector_ids[space] = rows[-1][0]
+
+    def _load_shared_counters(self):
+        with self.lock:
+            counters = self.conn.execute("SELECT key, value FROM counters").fetchall()
+            states = self.conn.execute("SELECT key, value FROM meta WHERE key LIKE 'state:%'").fetchall()
+            ratings = self.conn.execute("SELECT id, rating FROM feedback WHERE id > ? ORDER BY id",
+                                        (self.synced_feedback_id,)).fetchall()
+        with STATS_LOCK:
+            for key, value in counters:
+                if key.startswith("processed:"):
+                    PROCESSING_ACTIVITY.set(int(key[10:]), int(value))
+                elif not key.startswith("daily:"):  # weekday-keyed counters from older versions
+                    STATS[key] = int(value)
+            for key, value in states:
+                STATS[key[6:]] = json.loads(value)
+            FEEDBACK["ratings"].extend(r for _, r in ratings)
+        if ratings:
+            self.synced_feedback_id = ratings[-1][0]
+
+    def _spaces(self):
+        return [space for space in self.SPACES if self._vectors(space) is not None]
+
+    def _check_encoder(self):
+        """Drop saved vectors written by a different encoder: they live in another embedding space."""
+        signature, stale = encoder_signature(), []
+        with self.lock, self.conn:
+            stored = self._meta("encoder")
+            if stored is not None and stored != signature:
+                for table, _, vectors, meta_key, _ in self.SPACES.values():
+                    stale.append(self._meta(meta_key))
+                    self.conn.execute(f"DELETE FROM {table}")
+                    self.conn.execute(f"DELETE FROM {vectors}")
+                    self.conn.execute("DELETE FROM meta WHERE key = ?", (meta_key,))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              ("encoder", json.dumps(signature)))
+        for name in filter(None, stale):
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def restore(self):
+        """Reload triples, mapped embeddings and counters; only unsaved nodes and triples are re-encoded."""
+        t0 = time.time()
+        if not self.shared:
+            for key, value in self.conn.execute("SELECT key, value FROM meta"):
+                value = json.loads(value)
+                if key == "stats":
+                    STATS.update(value)
+                elif key == "feedback":
+                    FEEDBACK.update(value)
+                elif key == "processing_activity":
+                    PROCESSING_ACTIVITY.load(value)
+        self._check_encoder()  # a backend/model switch re-encodes everything below
+        with self.lock:  # the live rows loaded below already reflect every logged deletion
+            self.synced_deletion_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM deletions").fetchone()[0]
+        self._load_triples()
+        for space in self._spaces():
+            self._load_matrix(space)
+            if self.shared:
+                self._load_shared_vectors(space)
+        if self.shared:
+            self._load_shared_counters()
+        everything = range(len(semantic_search_data))
+        if EDGE_INDEX is not None:
+            EDGE_INDEX.link(everything)
+            EDGE_INDEX.retire_unlinked()  # saved sentences of triples deleted since
+        NODE_EMBEDDINGS.retire([n for n in NODE_EMBEDDINGS.nodes if not semantic_search_data.degree(n)])
+        # nodes and triples ingested after the last save() still need encoding
+        embed_new_nodes(everything)
+        embed_new_edges(everything)
+        recalc_node_counts()
+        return {"triples": semantic_search_data.live_triples, "embeddings": len(NODE_EMBEDDINGS),
+                "edge_embeddings": len(EDGE_INDEX) if EDGE_INDEX is not None else 0,
+                "seconds": round(time.time() - t0, 3)}
+
+    def sync(self):
+        """Shared mode: pull deletions, triples, vectors and counters written by other workers."""
+        with INGEST_LOCK:
+            deleted = self._load_deletions()
+            positions = self._load_triples()
+            for space in self._spaces():
+                rows = self._load_shared_vectors(space)
+                if space == "nodes" and rows:
+                    # vectors logged with triples that were deleted before this worker saw them
+                    with STORE_LOCK.write():
+                        NODE_EMBEDDINGS.retire([NODE_EMBEDDINGS.nodes[r] for r in rows
+                                                if not semantic_search_data.degree(NODE_EMBEDDINGS.nodes[r])])
+            if positions:
+                with STORE_LOCK.write():
+                    NODE_EMBEDDINGS.revive(semantic_search_data.node_names(positions))
+                    if EDGE_INDEX is not None:
+                        EDGE_INDEX.link(positions)
+                # normally nothing left: the writer logged its vectors with the triples
+                embed_new_nodes(positions)
+                embed_new_edges(positions)
+                with STORE_LOCK.write():
+                    semantic_search_data.generation += 1
+        self._load_shared_counters()
+        recalc_node_counts()
+        if positions or deleted:
+            CHANGES.bump("stats", "triples")
+        return len(positions)
+
+    def status(self):
+        with self.lock:
+            n_triples = self.conn.execute("SELECT COUNT(*) FROM triples WHERE deleted = 0").fetchone()[0]
+        return {"directory": self.directory, "shared": self.shared, "triples_persisted": n_triples,
+                "embeddings_saved": self.saved_rows["nodes"], "edge_embeddings_saved": self.saved_rows["edges"],
+                "last_saved": self.last_saved}
+
+def autosave_loop(snapshot, interval):
+    while True:
+        time.sleep(interval)
+        if snapshot.unsaved():
+            try:
+                snapshot.save()
+            except Exception:
+                pass  # retried on the next tick
+
+def shared_sync_loop(snapshot, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            snapshot.sync()
+        except Exception:
+            pass  # retried on the next tick
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR")
+SHARED_STORE = os.environ.get("SHARED_STORE", "0") == "1"
+SNAPSHOT = None
+if SNAPSHOT_DIR:
+    SNAPSHOT = Snapshot(SNAPSHOT_DIR, shared=SHARED_STORE)
+    SNAPSHOT.restore()
+    atexit.register(SNAPSHOT.save)
+    threading.Thread(target=autosave_loop, args=(SNAPSHOT, int(os.environ.get("SNAPSHOT_INTERVAL_S", 300))),
+                     name="snapshot-autosave", daemon=True).start()
+    if SHARED_STORE:
+        threading.Thread(target=shared_sync_loop, args=(SNAPSHOT, float(os.environ.get("SHARED_SYNC_INTERVAL_S", 0.5))),
+                         name="shared-store-sync", daemon=True).start()
 
 # -------------------------
 # Shared HTML snippets
@@ -88,6 +2613,19 @@ body{background:#f6f7fb;font-family:Inter,system-ui,Segoe UI,Roboto,Helvetica,Ar
 <div class="container my-3">
 """
 
+# live updates: one SSE stream per page instead of timers; plain polling is the fallback
+LIVE_UPDATES_JS = r"""
+<script>
+function liveUpdates(handlers, fallbackPoll){
+  if(!window.EventSource){ fallbackPoll(); setInterval(fallbackPoll, 2000); return; }
+  const es = new EventSource('/events?topics=' + Object.keys(handlers).join(','));
+  Object.entries(handlers).forEach(([topic, fn])=>{
+    es.addEventListener(topic, e=>{ try{ fn(JSON.parse(e.data)); }catch(err){ console.error(topic, err); } });
+  });
+}
+</script>
+"""
+
 BASE_FOOT = """
 </div>
 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
@@ -99,13 +2637,18 @@ BASE_FOOT = """
 # -------------------------
 
 # Semantic page: no quick analyze; show last uploaded filename for reference
-SEMANTIC_HTML = BASE_HEAD + NAVBAR + r"""
+SEMANTIC_HTML = BASE_HEAD + NAVBAR + LIVE_UPDATES_JS + r"""
 <h4>Semantic Search & Graph</h4>
 <div class="row g-3">
   <div class="col-lg-8">
     <div class="card p-3">
       <div class="d-flex gap-2 mb-2">
-        <input id="query" class="form-control" placeholder="Search nodes or type a query...">
+        <input id="query" class="form-control" list="querySuggestions" autocomplete="off" placeholder="Search nodes or type a query...">
+        <datalist id="querySuggestions"></datalist>
+        <select id="searchMode" class="form-select" style="max-width:140px">
+          <option value="hybrid">Nodes</option>
+          <option value="triples">Triples</option>
+        </select>
         <button id="searchBtn" class="btn btn-primary">Search</button>
       </div>
       <div id="graph"></div>
@@ -130,59 +2673,100 @@ SEMANTIC_HTML = BASE_HEAD + NAVBAR + r"""
 </div>
 
 <script>
-// draw graph (vis)
-function drawGraph(triples){
+// draw graph (vis); a server-side graph (budgeted, laid out) is drawn as-is with physics off
+function drawGraph(triples, graph, onMore){
   const container = document.getElementById('graph');
   if(!triples || triples.length===0){ container.innerHTML='<div class="text-muted p-3">No data</div>'; return; }
-  const nodes=[], edges=[], ids=new Set();
-  triples.forEach(t=>{
-    const s=t.subject, o=t.object;
-    if(!ids.has(s)){ nodes.push({id:s,label:s}); ids.add(s); }
-    if(!ids.has(o)){ nodes.push({id:o,label:o}); ids.add(o); }
-    edges.push({from:s,to:o,label:t.relation||''});
-  });
+  let nodes=[], edges=[];
+  if(graph){
+    nodes = graph.nodes.map(n=>n.summary ? Object.assign({}, n, {shape:'ellipse', color:'#ede9fe', font:{color:'#6d28d9'}}) : n);
+    edges = graph.edges.map(e=>e.summary ? Object.assign({}, e, {dashes:true, arrows:''}) : e);
+  } else {
+    const ids=new Set();
+    triples.forEach(t=>{
+      const s=t.subject, o=t.object;
+      if(!ids.has(s)){ nodes.push({id:s,label:s}); ids.add(s); }
+      if(!ids.has(o)){ nodes.push({id:o,label:o}); ids.add(o); }
+      edges.push({from:s,to:o,label:t.relation||''});
+    });
+  }
   const data={nodes:new vis.DataSet(nodes), edges:new vis.DataSet(edges)};
-  const options={nodes:{shape:'box',margin:8}, edges:{arrows:'to', smooth:true}, physics:{stabilization:true}};
-  new vis.Network(container, data, options);
+  const physics = graph ? false : {stabilization:true};
+  const options={nodes:{shape:'box',margin:8}, edges:{arrows:'to', smooth:!graph}, physics:physics};
+  const network = new vis.Network(container, data, options);
+  if(onMore){
+    network.on('click', p=>{ if(p.nodes.length && String(p.nodes[0]).startsWith('__more__:')) onMore(); });
+  }
+}
+
+// a node's edges, one budgeted page at a time; "N more" nodes load the next page
+async function showNode(name, offset){
+  const r = await fetch('/search_node', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({node:name, offset:offset||0})});
+  const j = await r.json();
+  const next = j.next_offset;
+  drawGraph(j.triples || [], j.graph, next != null ? ()=>showNode(name, next) : null);
+  document.getElementById('sentenceDisplay').textContent = (j.total > (j.triples||[]).length)
+    ? 'Showing ' + ((j.offset||0) + 1) + '-' + ((j.offset||0) + j.triples.length) + ' of ' + j.total + ' edges' : '';
 }
 
+// type-ahead from /autocomplete (debounced)
+let suggestTimer = null;
+document.getElementById('query').addEventListener('input', (ev)=>{
+  clearTimeout(suggestTimer);
+  const q = ev.target.value.trim();
+  suggestTimer = setTimeout(async ()=>{
+    if(q.length < 2) return;
+    try{
+      const r = await fetch('/autocomplete?limit=8&q=' + encodeURIComponent(q));
+      const j = await r.json();
+      const list = document.getElementById('querySuggestions'); list.innerHTML='';
+      (j.suggestions||[]).forEach(s=>{ const o = document.createElement('option'); o.value = s.name; list.appendChild(o); });
+    }catch(e){}
+  }, 150);
+});
+
 // search endpoint
 document.getElementById('searchBtn').addEventListener('click', async ()=>{
   const q = document.getElementById('query').value.trim(); if(!q) return;
-  const res = await fetch('/search', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({query:q})});
+  const mode = document.getElementById('searchMode').value;
+  const res = await fetch('/search', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({query:q, mode:mode})});
   if(!res.ok){ alert('Search failed'); return; }
   const j = await res.json();
   drawGraph(j.triples || []);
   const list = document.getElementById('searchResults'); list.innerHTML='';
+  if(mode === 'triples'){
+    (j.top_triples||[]).forEach((t, i)=>{
+      const li = document.createElement('li'); li.className='list-group-item';
+      li.textContent = j.sentences[i] + ' (score: '+(t.score||0).toFixed(3)+')';
+      list.appendChild(li);
+    });
+    return;
+  }
   (j.top_nodes||[]).forEach(n=>{
     const li = document.createElement('li'); li.className='list-group-item';
     li.textContent = n.name + ' (score: '+(n.score||0).toFixed(3)+')';
-    li.addEventListener('click', async ()=>{
-      const r = await fetch('/search_node', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({node:n.name})});
-      const jj = await r.json();
-      drawGraph(jj.triples || []);
-    });
+    li.addEventListener('click', ()=>showNode(n.name, 0));
     list.appendChild(li);
   });
 });
 
-// poll stats including last uploaded file
+// stats including last uploaded file (pushed by /events)
+function renderStats(s){
+  document.getElementById('filesUploaded').textContent = s.files_uploaded;
+  document.getElementById('triplesTotal').textContent = s.triples_total;
+  document.getElementById('uniqueNodes').textContent = s.unique_nodes;
+  document.getElementById('graphsProcessed').textContent = s.graphs_processed;
+  document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
+}
 async function pollStats(){
-  try{
-    const r = await fetch('/stats'); const s = await r.json();
-    document.getElementById('filesUploaded').textContent = s.files_uploaded;
-    document.getElementById('triplesTotal').textContent = s.triples_total;
-    document.getElementById('uniqueNodes').textContent = s.unique_nodes;
-    document.getElementById('graphsProcessed').textContent = s.graphs_processed;
-    document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
-  }catch(e){}
+  try{ const r = await fetch('/stats'); renderStats(await r.json()); }catch(e){}
 }
-setInterval(pollStats,2000); pollStats();
+liveUpdates({stats: renderStats}, pollStats);
 </script>
 """ + BASE_FOOT
 
 # Dashboard page (with Chart.js area chart)
-DASHBOARD_HTML = BASE_HEAD + NAVBAR + r"""
+DASHBOARD_HTML = BASE_HEAD + NAVBAR + LIVE_UPDATES_JS + r"""
 <h4>Admin Dashboard</h4>
 <div class="row g-3">
   <div class="col-lg-4">
@@ -235,44 +2819,40 @@ document.querySelectorAll('.star').forEach(s=>{
 document.getElementById('sendFeedback').addEventListener('click', async ()=>{
   if(selectedRating < 1) return alert('Pick 1-5');
   await fetch('/feedback',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({rating:selectedRating})});
-  selectedRating = 0; document.querySelectorAll('.star').forEach(x=> x.classList.remove('selected')); pollStats();
+  selectedRating = 0; document.querySelectorAll('.star').forEach(x=> x.classList.remove('selected'));
+  // the new average arrives through the stats push
 });
 
+function renderStats(s){
+  document.getElementById('filesUploaded').textContent = s.files_uploaded;
+  document.getElementById('triplesTotal').textContent = s.triples_total;
+  document.getElementById('uniqueNodes').textContent = s.unique_nodes;
+  document.getElementById('graphsProcessed').textContent = s.graphs_processed;
+  document.getElementById('processingJobs').textContent = s.processing_jobs;
+  document.getElementById('lastGraphTime').textContent = s.last_graph_time_ms;
+  document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
+  document.getElementById('avgRating').textContent = s.avg_rating !== null ? s.avg_rating.toFixed(2) : '—';
+}
+
+function renderTriples(j){
+  document.getElementById('triplesPreview').textContent = (j.triples || []).map(x=> `${x.subject} ${x.relation} ${x.object}`).join('\n');
+}
+
+// fallback when EventSource is unavailable: conditional GETs (304 when unchanged)
 async function loadPreview(){
-  try{
-    const r = await fetch('/stats'); const s = await r.json();
-    document.getElementById('filesUploaded').textContent = s.files_uploaded;
-    document.getElementById('triplesTotal').textContent = s.triples_total;
-    document.getElementById('uniqueNodes').textContent = s.unique_nodes;
-    document.getElementById('graphsProcessed').textContent = s.graphs_processed;
-    document.getElementById('processingJobs').textContent = s.processing_jobs;
-    document.getElementById('lastGraphTime').textContent = s.last_graph_time_ms;
-    document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
-    document.getElementById('avgRating').textContent = s.avg_rating !== null ? s.avg_rating.toFixed(2) : '—';
-  }catch(e){}
-  // fetch recent triples
-  try{
-    const t = await fetch('/recent_triples'); const j = await t.json();
-    document.getElementById('triplesPreview').textContent = (j.triples || []).map(x=> ${x.subject} ${x.relation} ${x.object}).join('\n');
-  }catch(e){}
-  // update chart too
-  loadMetricsAndDraw();
+  try{ const r = await fetch('/stats'); renderStats(await r.json()); }catch(e){}
+  try{ const t = await fetch('/recent_triples'); renderTriples(await t.json()); }catch(e){}
+  try{ const m = await fetch('/metrics'); if(m.ok) drawMetrics(await m.json()); }catch(e){}
 }
 
 function drawGraphSmall(triples){
   // kept for possible future small previews; currently we show triples in text
 }
 
-// initial load/poll
-setInterval(loadPreview,2000); loadPreview();
-
 /* Chart rendering */
 let pipelineChart = null;
-async function loadMetricsAndDraw(){
+function drawMetrics(j){
   try{
-    const r = await fetch('/metrics');
-    if(!r.ok) return;
-    const j = await r.json();
     const labels = j.labels || ["Mon","Tue","Wed","Thu","Fri","Sat","Sun"];
     const counts = j.counts || [0,0,0,0,0,0,0];
 
@@ -328,23 +2908,32 @@ async function loadMetricsAndDraw(){
       pipelineChart = new Chart(ctx, cfg);
     }
   } catch(e){
-    console.error('metrics load failed', e);
+    console.error('metrics draw failed', e);
   }
 }
-// poll metrics every 10s
-setInterval(loadMetricsAndDraw, 10000);
+
+liveUpdates({stats: renderStats, triples: renderTriples, metrics: drawMetrics}, loadPreview);
 </script>
 """ + BASE_FOOT
 
 # Upload page: upload, progress, and immediate graph preview of latest triples
-UPLOAD_HTML = BASE_HEAD + NAVBAR + r"""
+UPLOAD_HTML = BASE_HEAD + NAVBAR + LIVE_UPDATES_JS + r"""
 <h4>Upload CSV & Manual Graph</h4>
 <div class="row g-3">
   <div class="col-lg-6">
     <div class="card p-3">
       <h6>Upload CSV (subject,relation,object)</h6>
-      <input type="file" id="csvFile" class="form-control mb-2" accept=".csv">
-      <div class="progress mb-2"><div id="uploadProgress" class="progress-bar" style="width:0%"></div></div>
+      <input type="file" id="csvFile" class="form-control mb-2" accept=".csv,.gz,.ndjson,.jsonl,.parquet,.arrow,.feather">
+      <div class="small text-muted mb-2">Also NDJSON, gzip (.csv.gz / .ndjson.gz) and Parquet/Arrow. <a href="/export">Export NDJSON</a> · <a href="/export?format=parquet">Parquet</a></div>
+      <div class="progress mb-1">
+        <div id="uploadProgress" class="progress-bar" style="width:0%"></div>
+        <div id="processProgress" class="progress-bar bg-success" style="width:0%"></div>
+      </div>
+      <div class="form-check small mb-2">
+        <input class="form-check-input" type="checkbox" id="syncUpload">
+        <label class="form-check-label" for="syncUpload">Sync: replace what was loaded from a file with this name (deletes triples no longer in it)</label>
+      </div>
+      <div id="uploadStatus" class="small text-muted mb-2"></div>
       <button id="uploadBtn" class="btn btn-primary w-100">Upload CSV</button>
     </div>
 
@@ -372,32 +2961,64 @@ UPLOAD_HTML = BASE_HEAD + NAVBAR + r"""
 </div>
 
 <script>
-/* Upload with progress and then fetch latest triples to preview graph */
+/* poll a background job until it finishes; onProgress gets each status snapshot */
+async function waitForJob(jobId, onProgress){
+  while(true){
+    const r = await fetch('/jobs/' + jobId);
+    if(!r.ok) throw new Error('job status failed');
+    const job = await r.json();
+    if(onProgress) onProgress(job);
+    if(job.state === 'done' || job.state === 'failed') return job;
+    await new Promise(res=> setTimeout(res, 500));
+  }
+}
+
+/* Upload with progress: first half of the bar is the byte transfer, second half server-side processing */
 document.getElementById('uploadBtn').addEventListener('click', ()=>{
   const fileInput = document.getElementById('csvFile');
   if(!fileInput.files[0]) return alert('Choose CSV');
   const file = fileInput.files[0];
+  const uploadBar = document.getElementById('uploadProgress');
+  const processBar = document.getElementById('processProgress');
+  const status = document.getElementById('uploadStatus');
+  processBar.style.width = '0%';
   const xhr = new XMLHttpRequest();
   xhr.open('POST','/upload',true);
   xhr.upload.onprogress = (e)=> {
     if(e.lengthComputable) {
       const pct = Math.round((e.loaded / e.total) * 100);
-      document.getElementById('uploadProgress').style.width = pct + '%';
+      uploadBar.style.width = (pct / 2) + '%';
+      status.textContent = 'Uploading… ' + pct + '%';
     }
   };
   xhr.onload = async function(){
-    document.getElementById('uploadProgress').style.width = '0%';
-    if(xhr.status===200){
-      alert('Uploaded and processed');
+    if(xhr.status!==202){
+      uploadBar.style.width = '0%'; status.textContent = '';
+      alert('Upload failed: ' + xhr.responseText);
+      return;
+    }
+    uploadBar.style.width = '50%';
+    const accepted = JSON.parse(xhr.responseText);
+    try{
+      const job = await waitForJob(accepted.job_id, j=>{
+        processBar.style.width = ((j.progress || 0) * 50) + '%';
+        status.textContent = 'Processing: ' + j.rows_processed + ' rows' + (j.rows_per_s ? ' (' + Math.round(j.rows_per_s) + ' rows/s)' : '');
+      });
+      if(job.state === 'failed'){ alert('Processing failed: ' + job.errors.join('; ')); return; }
+      const r = job.result || {};
+      status.textContent = 'Added ' + r.triples_added + ' triples, ' + r.duplicates + ' duplicates, ' + r.rows_skipped + ' rows skipped'
+        + (r.sync ? ', ' + r.triples_updated + ' updated, ' + r.triples_deleted + ' deleted' : '');
       await pollStats();
       // fetch recent triples and draw them
-      const t = await fetch('/recent_triples'); const j = await t.json();
-      drawGraph(j.triples || []);
-    } else {
-      alert('Upload failed: ' + xhr.responseText);
+      const t = await fetch('/recent_triples?graph=1'); const j = await t.json();
+      drawGraph(j.triples || [], j.graph);
+    } finally {
+      uploadBar.style.width = '0%'; processBar.style.width = '0%';
     }
   };
-  const fd = new FormData(); fd.append('file', file); xhr.send(fd);
+  const fd = new FormData(); fd.append('file', file);
+  if(document.getElementById('syncUpload').checked) fd.append('sync', '1');
+  xhr.send(fd);
 });
 
 /* Manual analyze */
@@ -405,37 +3026,44 @@ document.getElementById('analyzeBtn').addEventListener('click', async ()=>{
   const text = document.getElementById('sentence').value.trim(); if(!text) return;
   const res = await fetch('/analyze', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({text})});
   if(!res.ok){ alert('Analyze failed'); return; }
-  const j = await res.json();
-  drawGraph(j.triples || []);
+  const job = await waitForJob((await res.json()).job_id);
+  if(job.state === 'failed'){ alert('Analyze failed: ' + job.errors.join('; ')); return; }
+  drawGraph((job.result || {}).triples || [], (job.result || {}).graph);
   await pollStats();
 });
 
-/* draw graph util */
-function drawGraph(triples){
+/* draw graph util: the server-side graph (budgeted, laid out) is drawn as-is with physics off */
+function drawGraph(triples, graph){
   const container = document.getElementById('graph');
   if(!triples || triples.length===0){ container.innerHTML='<div class="text-muted p-3">No data</div>'; return; }
-  const nodes=[], edges=[], ids=new Set();
-  triples.forEach(t=>{
-    const s=t.subject, o=t.object;
-    if(!ids.has(s)){ nodes.push({id:s,label:s}); ids.add(s); }
-    if(!ids.has(o)){ nodes.push({id:o,label:o}); ids.add(o); }
-    edges.push({from:s,to:o,label:t.relation||''});
-  });
+  let nodes=[], edges=[];
+  if(graph){
+    nodes = graph.nodes; edges = graph.edges;
+  } else {
+    const ids=new Set();
+    triples.forEach(t=>{
+      const s=t.subject, o=t.object;
+      if(!ids.has(s)){ nodes.push({id:s,label:s}); ids.add(s); }
+      if(!ids.has(o)){ nodes.push({id:o,label:o}); ids.add(o); }
+      edges.push({from:s,to:o,label:t.relation||''});
+    });
+  }
   const data={nodes:new vis.DataSet(nodes), edges:new vis.DataSet(edges)};
-  const options={nodes:{shape:'box',margin:8}, edges:{arrows:'to', smooth:true}, physics:{stabilization:true}};
+  const options={nodes:{shape:'box',margin:8}, edges:{arrows:'to', smooth:!graph}, physics:graph ? false : {stabilization:true}};
   new vis.Network(container, data, options);
 }
 
-/* poll stats */
+/* stats (pushed by /events; pollStats is the on-demand/fallback path) */
+function renderStats(s){
+  document.getElementById('filesUploaded').textContent = s.files_uploaded;
+  document.getElementById('triplesTotal').textContent = s.triples_total;
+  document.getElementById('uniqueNodes').textContent = s.unique_nodes;
+  document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
+}
 async function pollStats(){
-  try{ const r = await fetch('/stats'); const s = await r.json();
-    document.getElementById('filesUploaded').textContent = s.files_uploaded;
-    document.getElementById('triplesTotal').textContent = s.triples_total;
-    document.getElementById('uniqueNodes').textContent = s.unique_nodes;
-    document.getElementById('lastUploadedFile').textContent = s.last_uploaded_file || '—';
-  }catch(e){}
+  try{ const r = await fetch('/stats'); renderStats(await r.json()); }catch(e){}
 }
-setInterval(pollStats,2000); pollStats();
+liveUpdates({stats: renderStats}, pollStats);
 </script>
 """ + BASE_FOOT
 
@@ -454,28 +3082,416 @@ def dashboard_page():
 def upload_page():
     return render_template_string(UPLOAD_HTML, page='upload')
 
+# -------------------------
+# Subgraph budgets & cached layouts (what the browser is asked to draw)
+# -------------------------
+GRAPH_NODE_BUDGET = int(os.environ.get("GRAPH_NODE_BUDGET", 150))
+GRAPH_EDGE_BUDGET = int(os.environ.get("GRAPH_EDGE_BUDGET", 300))
+MAX_SUMMARY_NODES = 12
+LAYOUT_CACHE = LRUCache(int(os.environ.get("LAYOUT_CACHE_SIZE", 512)))
+
+def rank_node_edges(store, node_id, positions):
+    """Order a node's edges for display: round-robin across relations (largest first),
+    best-connected neighbours first within each relation, so every relation shows up
+    on the first page and paging walks down the long tail."""
+    groups = {}
+    for pos in positions:
+        other = store.o[pos] if store.s[pos] == node_id else store.s[pos]
+        groups.setdefault(store.r[pos], []).append((-store.node_refs[other], pos))
+    ranked = sorted(groups.values(), key=len, reverse=True)
+    for edges in ranked:
+        edges.sort()
+    order = []
+    for i in range(len(ranked[0]) if ranked else 0):
+        for edges in ranked:
+            if i >= len(edges):
+                break  # groups are sorted by size, so the rest are exhausted too
+            order.append(edges[i][1])
+    return order
+
+def budget_triples(triples, center=None, node_budget=GRAPH_NODE_BUDGET, edge_budget=GRAPH_EDGE_BUDGET):
+    """Longest prefix of triples (already in priority order) that fits the budgets; returns (kept, dropped).
+
+    The first triple is always kept, so paging through next_offset makes progress.
+    """
+    nodes = {center} if center else set()
+    for i, t in enumerate(triples):
+        new = {t["subject"], t["object"]} - nodes
+        if i and (i >= edge_budget or len(nodes) + len(new) > node_budget):
+            return triples[:i], triples[i:]
+        nodes |= new
+    return triples, []
+
+def relation_summary(relations):
+    """[(relation, count)] for "N more" nodes: the biggest groups, the remainder folded into one."""
+    counts = {}
+    for rel in relations:
+        counts[rel] = counts.get(rel, 0) + 1
+    top = sorted(counts.items(), key=lambda kv: -kv[1])
+    if len(top) > MAX_SUMMARY_NODES:
+        top = top[:MAX_SUMMARY_NODES - 1] + [(None, sum(c for _, c in top[MAX_SUMMARY_NODES - 1:]))]
+    return top
+
+def force_layout(n, edges, pinned=None, iterations=80, seed=0):
+    """Fruchterman-Reingold layout in numpy; returns an (n, 2) array in vis-network pixels."""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, (n, 2))
+    if n < 2:
+        return np.zeros((n, 2))
+    src = np.array([e[0] for e in edges], dtype=np.int64)
+    dst = np.array([e[1] for e in edges], dtype=np.int64)
+    k = np.sqrt(4.0 / n)
+    temperature = 0.2
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.maximum(np.linalg.norm(delta, axis=2), 1e-3)
+        disp = (delta * (k * k / dist ** 2)[..., None]).sum(axis=1)  # repulsion between all pairs
+        if len(src):
+            d = pos[src] - pos[dst]
+            dl = np.maximum(np.linalg.norm(d, axis=1), 1e-3)
+            pull = d * (dl / k)[:, None]  # attraction along edges
+            np.add.at(disp, src, -pull)
+            np.add.at(disp, dst, pull)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        if pinned is not None:
+            pos -= pos[pinned]
+        temperature *= 0.95
+    return pos * (120 * np.sqrt(n) / max(np.abs(pos).max(), 1e-9))
+
+def node_degrees(store, triples, center=None):
+    """{name: degree} for the endpoints of triples; call under STORE_LOCK.read()."""
+    names = {center} if center else set()
+    for t in triples:
+        names.add(t["subject"]); names.add(t["object"])
+    return {n: store.degree(n) for n in names}
+
+def graph_payload(triples, degrees, center=None, more=()):
+    """vis-network nodes/edges for triples plus "N more" summary nodes hung off center.
+
+    Coordinates come from force_layout() and are cached per node/edge set, so
+    the client draws with physics off and popular neighbourhoods are laid out
+    once. Runs outside the store lock.
+    """
+    index, nodes, edges = {}, [], []
+    def node(name, **extra):
+        if name not in index:
+            index[name] = len(nodes)
+            nodes.append(dict({"id": name, "label": name}, **extra))
+        return index[name]
+    if center:
+        node(center, degree=degrees.get(center, 0), center=True)
+    pairs = []
+    for t in triples:
+        s = node(t["subject"], degree=degrees.get(t["subject"], 0))
+        o = node(t["object"], degree=degrees.get(t["object"], 0))
+        edges.append({"from": t["subject"], "to": t["object"], "label": t["relation"]})
+        pairs.append((s, o))
+    for relation, count in more:
+        sid = f"__more__:{relation or '*'}"
+        label = f"{count} more" + (f" {relation}" if relation else "")
+        s = node(sid, label=label, summary=True, relation=relation, count=count)
+        if center:
+            edges.append({"from": center, "to": sid, "label": relation or "", "summary": True})
+            pairs.append((index[center], s))
+    key = (tuple(n["id"] for n in nodes), tuple(pairs))
+    coords = LAYOUT_CACHE.get(key)
+    if coords is None:
+        with STAGE_TIMINGS.time("layout"):
+            coords = force_layout(len(nodes), pairs, pinned=index.get(center),
+                                  seed=zlib.crc32(repr(key[0][:8]).encode())).round(1).tolist()
+        LAYOUT_CACHE.put(key, coords)
+    for n, (x, y) in zip(nodes, coords):
+        n["x"], n["y"] = x, y
+    return {"nodes": nodes, "edges": edges, "physics": False}
+
+def budgeted_graph(triples):
+    """graph_payload() of the prefix of a flat triple list (no centre) that fits the default budgets."""
+    shown, _ = budget_triples(triples)
+    with STORE_LOCK.read():
+        degrees = node_degrees(semantic_search_data, shown)
+    return graph_payload(shown, degrees)
+
+# -------------------------
+# Request timing & profiling
+# -------------------------
+class RequestSampler:
+    """Sampling profiler for in-flight requests.
+
+    A daemon thread snapshots the stack of every thread that is serving a
+    request every ``interval`` seconds; when the request ends the samples are
+    returned as collapsed stacks ("outer;inner count", flamegraph format).
+    Costs nothing while no request is in flight.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self):
+        with self._lock:
+            self.active[threading.get_ident()] = {}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+                self._thread.start()
+
+    def end(self):
+        with self._lock:
+            samples = self.active.pop(threading.get_ident(), {})
+        return "\n".join(f"{stack} {n}" for stack, n in sorted(samples.items(), key=lambda kv: -kv[1]))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for tid, samples in self.active.items():
+                    frame, stack = frames.get(tid), []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    key = ";".join(reversed(stack))
+                    samples[key] = samples.get(key, 0) + 1
+
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"  # honour ?profile=1 (cProfile)
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))      # sample all requests, keep slow ones
+PROFILES = deque(maxlen=int(os.environ.get("PROFILE_KEEP", 20)))
+REQUEST_SAMPLER = RequestSampler() if PROFILE_SLOW_MS > 0 else None
+
+@app.before_request
+def _start_request_timing():
+    g.request_t0 = time.perf_counter()
+    g.profiler = None
+    if PROFILE_REQUESTS and request.args.get("profile") == "1":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+        except ValueError:
+            pass  # another profiler is already running in this process
+    elif REQUEST_SAMPLER is not None:
+        REQUEST_SAMPLER.begin()
+
+@app.after_request
+def _finish_request_timing(resp):
+    elapsed = time.perf_counter() - g.get("request_t0", time.perf_counter())
+    REQUEST_TIMINGS.observe(request.endpoint or "unmatched", elapsed)
+    profile = None
+    if g.get("profiler") is not None:
+        g.profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(g.profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        profile = ("cprofile", out.getvalue())
+    elif REQUEST_SAMPLER is not None:
+        samples = REQUEST_SAMPLER.end()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            profile = ("sampling", samples)
+    if profile is not None:
+        pid = uuid.uuid4().hex[:12]
+        PROFILES.append({"id": pid, "kind": profile[0], "endpoint": request.endpoint, "path": request.path,
+                         "duration_ms": round(elapsed * 1000, 3), "created": time.time(), "text": profile[1]})
+        resp.headers["X-Profile-Id"] = pid
+    return resp
+
+@app.route("/debug/profiles", methods=["GET"])
+def list_profiles():
+    return jsonify({"profiles": [{k: v for k, v in p.items() if k != "text"} for p in PROFILES]})
+
+@app.route("/debug/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    for p in PROFILES:
+        if p["id"] == profile_id:
+            return Response(p["text"], mimetype="text/plain")
+    return jsonify({"error": "unknown profile"}), 404
+
 # -------------------------
 # API endpoints
 # -------------------------
+def stats_payload():
+    with STATS_LOCK:
+        ratings = FEEDBACK["ratings"]
+        avg = sum(ratings) / len(ratings) if ratings else None
+        out = dict(STATS)
+    out["processing_jobs"] = JOBS.active_count()
+    out["encoder"] = encoder_signature()
+    if EMBEDDING_BATCHER is not None:
+        out["embedding_batcher"] = EMBEDDING_BATCHER.stats()
+    out["cache"] = {"query_embeddings": QUERY_EMBEDDING_CACHE.stats(),
+                    "search_results": SEARCH_RESULT_CACHE.stats(),
+                    "layouts": LAYOUT_CACHE.stats()}
+    with STORE_LOCK.read():
+        graph = semantic_search_data.graph_summary()
+    graph.update(GRAPH_STATS.result)
+    out["graph"] = graph
+    out["avg_rating"] = avg
+    return out
+
+def recent_triples_payload(graph=False):
+    # return last 50 triples (with graph: also laid out, for the upload page)
+    with STORE_LOCK.read():
+        out = {"triples": semantic_search_data.recent(50)}
+    if graph:
+        out["graph"] = budgeted_graph(out["triples"])
+    return out
+
+METRICS_WINDOWS = {"7d": (86400, 7, "%a %d"), "24h": (3600, 24, "%H:00")}
+
+def metrics_payload(window="7d"):
+    """Processed items per day (7d) or per hour (24h), oldest first, in UTC."""
+    width, n, fmt = METRICS_WINDOWS[window]
+    with STATS_LOCK:
+        starts, counts = PROCESSING_ACTIVITY.series(width, n)
+    labels = [datetime.fromtimestamp(ts, timezone.utc).strftime(fmt) for ts in starts]
+    return {"labels": labels, "counts": counts, "window": window}
+
+TOPIC_PAYLOADS = {"stats": stats_payload, "triples": recent_triples_payload, "metrics": metrics_payload}
+
+def json_response(payload):
+    with STAGE_TIMINGS.time("serialise"):
+        return jsonify(payload)
+
+def conditional_json(payload):
+    """JSON response with a content ETag; answers If-None-Match with a bodiless 304."""
+    resp = json_response(payload)
+    resp.add_etag()
+    return resp.make_conditional(request)
+
 @app.route("/stats", methods=["GET"])
 def get_stats():
-    avg = None
-    if FEEDBACK["ratings"]:
-        avg = sum(FEEDBACK["ratings"]) / len(FEEDBACK["ratings"])
-    out = dict(STATS)
-    out["avg_rating"] = avg
-    return jsonify(out)
+    return conditional_json(stats_payload())
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 once the requested models (default: all) are loaded.
+
+    Models that have not been loaded yet (WARMUP_MODELS=0 and no traffic) start
+    loading in the background on the first probe, so the probe turns 200 on its own.
+    """
+    wanted = [m for m in (request.args.get("models") or "").split(",") if m] or list(MODELS)
+    unknown = [m for m in wanted if m not in MODELS]
+    if unknown:
+        return jsonify({"error": "unknown models: " + ", ".join(unknown)}), 400
+    if any(MODELS[m].state == "not_loaded" for m in wanted):
+        start_warmup_thread([MODELS[m] for m in wanted])
+    is_ready = all(MODELS[m].state == "loaded" for m in wanted)
+    body = {"ready": is_ready, "models": {m: MODELS[m].status() for m in wanted}}
+    return jsonify(body), (200 if is_ready else 503)
+
+@app.route("/snapshot", methods=["GET", "POST"])
+def snapshot():
+    """GET: persistence status; POST: write the embedding snapshot now."""
+    if SNAPSHOT is None:
+        return jsonify({"error": "persistence disabled (set SNAPSHOT_DIR)"}), 404
+    if request.method == "POST":
+        SNAPSHOT.save()
+    return jsonify(SNAPSHOT.status())
+
+# generations restart at 0 in every process (restarts, other SHARED_STORE workers)
+BOOT_EPOCH = uuid.uuid4().hex[:8]
 
 @app.route("/recent_triples", methods=["GET"])
 def recent_triples():
-    # return last 50 triples
-    return jsonify({"triples": semantic_search_data[-50:]})
+    # a cheap ETag: the position count moves as soon as recent() can return a new
+    # row (the generation only once it is embedded), the generation on deletes,
+    # type updates and compaction; read before the payload, so never newer than it
+    graph = request.args.get("graph") == "1"
+    store = semantic_search_data
+    etag = f"{BOOT_EPOCH}-n{len(store)}-g{store.generation}" + ("-graph" if graph else "")
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    resp = json_response(recent_triples_payload(graph))
+    resp.set_etag(etag)
+    return resp
 
 @app.route("/metrics", methods=["GET"])
 def metrics():
-    labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    counts = [PROCESSING_DAILY.get(i, 0) for i in range(7)]
-    return jsonify({"labels": labels, "counts": counts})
+    window = request.args.get("window", "7d")
+    if window not in METRICS_WINDOWS:
+        return jsonify({"error": "window must be one of: " + ", ".join(METRICS_WINDOWS)}), 400
+    return conditional_json(metrics_payload(window))
+
+def _prometheus_histograms(lines, name, help_text, label, timer):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, hist in sorted(timer.histograms.items()):
+        buckets, total, count = hist.cumulative()
+        for le, c in buckets:
+            le = "+Inf" if le == float("inf") else f"{le:g}"
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{le}"}} {c}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {total:.6f}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {count}')
+
+def prometheus_text():
+    stats = stats_payload()
+    lines = []
+    def family(name, kind, help_text, samples):
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+    family("kmap_triples", "gauge", "Triples in the store.", [("", stats["triples_total"])])
+    family("kmap_nodes", "gauge", "Distinct nodes in the store.", [("", stats["unique_nodes"])])
+    family("kmap_embeddings", "gauge", "Node embeddings held in memory.", [("", len(NODE_EMBEDDINGS))])
+    family("kmap_files_uploaded_total", "counter", "CSV files ingested.", [("", stats["files_uploaded"])])
+    family("kmap_documents_analyzed_total", "counter", "Texts run through extraction.",
+           [("", stats["graphs_processed"])])
+    family("kmap_jobs_active", "gauge", "Queued or running ingestion jobs.", [("", stats["processing_jobs"])])
+    for what in ("hits", "misses"):
+        family(f"kmap_cache_{what}_total", "counter", f"Cache {what}.",
+               [(f'{{cache="{c}"}}', cs[what]) for c, cs in stats["cache"].items()])
+    if "embedding_batcher" in stats:
+        family("kmap_embedding_queue_depth", "gauge", "Encode requests waiting for the batcher.",
+               [("", stats["embedding_batcher"]["queue_depth"])])
+    _prometheus_histograms(lines, "kmap_stage_duration_seconds", "Time spent per pipeline stage.",
+                           "stage", STAGE_TIMINGS)
+    _prometheus_histograms(lines, "kmap_request_duration_seconds", "HTTP request latency by endpoint.",
+                           "endpoint", REQUEST_TIMINGS)
+    return "\n".join(lines) + "\n"
+
+@app.route("/metrics/prometheus", methods=["GET"])
+def metrics_prometheus():
+    """Prometheus text exposition of counters and latency histograms."""
+    return Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/latency", methods=["GET"])
+def metrics_latency():
+    """JSON summary (count, mean, p50/p95/p99) of the stage and endpoint histograms."""
+    return jsonify({"stages": STAGE_TIMINGS.summary(), "endpoints": REQUEST_TIMINGS.summary()})
+
+SSE_KEEPALIVE_S = 15
+SSE_MIN_INTERVAL_S = 0.5   # coalesce bursts (e.g. batch-by-batch ingest) into one push
+SSE_MAX_STREAM_S = 300     # clients reconnect automatically; frees the worker thread
+
+@app.route("/events", methods=["GET"])
+def events():
+    """Server-sent events: pushes stats/triples/metrics only when they change."""
+    topics = [t for t in (request.args.get("topics") or ",".join(ChangeFeed.TOPICS)).split(",")
+              if t in ChangeFeed.TOPICS]
+    if not topics:
+        return jsonify({"error": "topics must be among: " + ", ".join(ChangeFeed.TOPICS)}), 400
+
+    def stream():
+        sent = {t: -1 for t in topics}  # -1 forces an initial snapshot of every topic
+        version = -1
+        deadline = time.monotonic() + SSE_MAX_STREAM_S
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            version, versions = CHANGES.wait(version, SSE_KEEPALIVE_S)
+            changed = [t for t in topics if versions[t] > sent[t]]
+            if not changed:
+                yield ": keepalive\n\n"
+                continue
+            for t in changed:
+                sent[t] = versions[t]
+                yield f"event: {t}\nid: {version}\ndata: {json.dumps(TOPIC_PAYLOADS[t]())}\n\n"
+            time.sleep(SSE_MIN_INTERVAL_S)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route("/feedback", methods=["POST"])
 def feedback():
@@ -487,44 +3503,137 @@ def feedback():
         return jsonify({"error":"invalid rating"}), 400
     if rating < 1 or rating > 5:
         return jsonify({"error":"rating must be 1..5"}), 400
-    FEEDBACK["ratings"].append(rating)
+    if SNAPSHOT is not None and SNAPSHOT.shared:
+        SNAPSHOT.add_feedback(rating)  # picked up by every worker's sync, including this one
+    else:
+        with STATS_LOCK:
+            FEEDBACK["ratings"].append(rating)
+    CHANGES.bump("stats")
     return jsonify({"status":"ok"})
 
+def run_analyze_job(job, texts, batch_size=None, n_process=1):
+    t0 = time.time()
+    counters = new_ingest_counters()
+    counters["documents"] = 0
+    extracted = [] if len(texts) == 1 else None  # echo triples back for single-text requests
+    def doc_batches():
+        batch = []
+        for triples in extract_corpus(texts, batch_size=batch_size or NLP_BATCH_SIZE, n_process=n_process):
+            counters["documents"] += 1
+            job.rows_processed = counters["documents"]
+            if extracted is not None:
+                extracted.extend(triples)
+            batch.extend(triples)
+            if len(batch) >= INGEST_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    ingest_batches(doc_batches(), counters)
+    added = counters["triples_added"]
+
+    recalc_node_counts()
+    incr_stat("graphs_processed", counters["documents"])
+    # bump at least 1 so the pipeline shows activity even for small analyses
+    bump_processing_count(max(1, added))
+    elapsed = time.time() - t0
+    set_stat("last_graph_time_ms", int(elapsed * 1000))
+    if extracted is not None:
+        return {"triples": extracted, "graph": budgeted_graph(extracted), "added": added,
+                "duplicates": counters["duplicates"]}
+    counters["docs_per_s"] = round(counters["documents"] / elapsed, 2) if elapsed > 0 else None
+    counters["triples_total"] = semantic_search_data.live_triples
+    return counters
+
+def open_import_batches(fh, path, fmt, gzipped, counters):
+    """Triple batches from an uploaded file in any IMPORT_FORMATS (CSV/NDJSON optionally gzipped)."""
+    if fmt in ("parquet", "arrow"):
+        return iter_arrow_batches(path, fmt, counters)
+    stream = gzip.GzipFile(fileobj=fh, mode="rb") if gzipped else fh
+    if fmt == "ndjson":
+        return iter_ndjson_batches(stream, counters)
+    return iter_csv_batches(stream, counters)
+
+def run_upload_job(job, path, filename, fmt="csv", gzipped=False, sync=False):
+    """Ingest an uploaded file. With ``sync`` the file replaces what was loaded from the same
+    filename before: changed types are updated and triples no longer in it are deleted."""
+    try:
+        with open(path, "rb") as fh:
+            counters = new_ingest_counters()
+            batches = open_import_batches(fh, path, fmt, gzipped, counters)
+            seen = set()
+            if sync:
+                def batches(batches=batches):
+                    for batch in batches:
+                        yield batch
+                        # committed by now, so every name is interned
+                        seen.update(semantic_search_data.key_of(t["subject"], t["relation"], t["object"])
+                                    for t in batch)
+                batches = batches()
+            def progress():
+                job.rows_processed = counters["rows_read"]
+                if counters.get("rows_total"):
+                    # columnar files are memory-mapped: report progress by rows
+                    job.bytes_processed = int((job.bytes_total or 0) * counters["rows_read"] / counters["rows_total"])
+                else:
+                    job.bytes_processed = fh.tell()
+            ingest_batches(batches, counters, on_batch=progress, source=filename, upsert=sync)
+            progress()
+        if sync:
+            removed = delete_triples(lambda store: [p for p in store.owned_positions(filename)
+                                                    if store._key(store.s[p], store.r[p], store.o[p]) not in seen])
+            counters["triples_deleted"] = len(removed)
+        job.bytes_processed = job.bytes_total or job.bytes_processed
+        if counters["rows_skipped"]:
+            job.errors.append(f"{counters['rows_skipped']} malformed or short rows skipped")
+        incr_stat("files_uploaded")
+        set_stat("last_uploaded_file", filename)
+        # bump daily pipeline count by number of new triples added
+        bump_processing_count(counters["triples_added"])
+        recalc_node_counts()
+        out = dict(counters)
+        out["format"] = fmt + (".gz" if gzipped else "")
+        out["sync"] = sync
+        out["triples_total"] = semantic_search_data.live_triples
+        return out
+    finally:
+        os.unlink(path)
+
 @app.route("/analyze", methods=["POST"])
 def analyze_text():
     data = request.json or {}
     text = (data.get("text") or "").strip()
     if not text:
         return jsonify({"triples": []}), 400
-    STATS["processing_jobs"] += 1
-    t0 = time.time()
-
-    doc = nlp(text)
-    entities = {ent.text: ent.label_ for ent in doc.ents}
-
-    triples = []
-    # placeholder simple extraction; you can replace with real extraction
-    if "Albert Einstein" in text:
-        triples = [
-            {"subject":"Albert Einstein","relation":"developed","object":"theory of relativity","type_subject":entities.get("Albert Einstein"),"type_object":entities.get("theory of relativity")},
-            {"subject":"theory of relativity","relation":"created_in","object":"1905","type_subject":entities.get("theory of relativity"),"type_object":entities.get("1905")},
-            {"subject":"Albert Einstein","relation":"born_in","object":"Ulm","type_subject":entities.get("Albert Einstein"),"type_object":entities.get("Ulm")}
-        ]
+    try:
+        job = JOBS.submit("analyze", lambda job: run_analyze_job(job, [text]))
+    except queue.Full:
+        return queue_full_response()
+    return job_accepted_response(job)
 
-    # insert triples (naive dedupe)
-    added = 0
-    for t in triples:
-        if not any((x["subject"], x["relation"], x["object"]) == (t["subject"], t["relation"], t["object"]) for x in semantic_search_data):
-            semantic_search_data.append(t); added += 1
+MAX_BATCH_DOCUMENTS = 10000
 
-    recalc_node_counts()
-    STATS["graphs_processed"] += 1
-    # bump at least 1 so the pipeline shows activity even for small analyses
-    bump_processing_count(max(1, added))
-    t1 = time.time()
-    STATS["last_graph_time_ms"] = int((t1 - t0) * 1000)
-    STATS["processing_jobs"] = max(0, STATS["processing_jobs"] - 1)
-    return jsonify({"triples": triples, "added": added})
+@app.route("/analyze_batch", methods=["POST"])
+def analyze_batch():
+    """Queue many documents for extraction through nlp.pipe in one background job."""
+    data = request.json or {}
+    docs = data.get("documents")
+    if not isinstance(docs, list) or not docs:
+        return jsonify({"error": "documents must be a non-empty list of strings"}), 400
+    if len(docs) > MAX_BATCH_DOCUMENTS:
+        return jsonify({"error": f"at most {MAX_BATCH_DOCUMENTS} documents per request"}), 400
+    texts = [d.strip() for d in docs if isinstance(d, str) and d.strip()]
+    try:
+        batch_size = max(1, int(data.get("batch_size", NLP_BATCH_SIZE)))
+        n_process = max(1, min(int(data.get("n_process", 1)), os.cpu_count() or 1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "batch_size and n_process must be integers"}), 400
+    try:
+        job = JOBS.submit("analyze_batch", lambda job: run_analyze_job(job, texts, batch_size, n_process),
+                          name=f"{len(texts)} documents")
+    except queue.Full:
+        return queue_full_response()
+    return job_accepted_response(job)
 
 @app.route("/upload", methods=["POST"])
 def upload_file():
@@ -533,57 +3642,448 @@ def upload_file():
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error":"no selected file"}),400
-    STATS["processing_jobs"] += 1
+    fmt = request.form.get("format")
+    sync = request.form.get("sync", "").lower() in ("1", "true", "on")
+    if fmt is not None and fmt not in IMPORT_FORMATS:
+        return jsonify({"error": "format must be one of: " + ", ".join(IMPORT_FORMATS)}), 400
+    if not JOBS.has_capacity():
+        return queue_full_response()
+    filename = file.filename
+    # the request body is gone once we return, so spool it to disk for the worker
+    fd, path = tempfile.mkstemp(prefix="upload-")
     try:
-        filename = file.filename
-        stream = io.StringIO(file.stream.read().decode("utf8"), newline=None)
-        reader = csv.reader(stream)
-        added = 0
-        for row in reader:
-            if len(row) < 3: continue
-            subj, rel, obj = row[0].strip(), row[1].strip(), row[2].strip()
-            triple = {"subject": subj, "relation": rel, "object": obj, "type_subject": None, "type_object": None}
-            if not any((x["subject"], x["relation"], x["object"]) == (subj, rel, obj) for x in semantic_search_data):
-                semantic_search_data.append(triple); added += 1
-        STATS["files_uploaded"] += 1
-        STATS["last_uploaded_file"] = filename
-        # bump daily pipeline count by number of new triples added
-        bump_processing_count(added)
-        recalc_node_counts()
-        STATS["processing_jobs"] = max(0, STATS["processing_jobs"] - 1)
-        return jsonify({"triples_added": added, "triples_total": len(semantic_search_data)})
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(file.stream, out, 1 << 20)
+        size = os.path.getsize(path)
+        with open(path, "rb") as fh:
+            detected, gzipped = detect_import_format(filename, fh.read(2))
+        fmt = fmt or detected
+        if fmt in ("parquet", "arrow") and optional_pyarrow() is None:
+            os.unlink(path)
+            return jsonify({"error": "Parquet/Arrow import needs pyarrow (pip install pyarrow)"}), 400
+        job = JOBS.submit("upload", lambda job: run_upload_job(job, path, filename, fmt, gzipped, sync),
+                          name=filename, bytes_total=size)
+    except queue.Full:
+        os.unlink(path)
+        return queue_full_response()
     except Exception as e:
-        STATS["processing_jobs"] = max(0, STATS["processing_jobs"] - 1)
+        if os.path.exists(path):
+            os.unlink(path)
         return jsonify({"error": str(e)}), 500
+    return job_accepted_response(job)
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
+
+SEARCH_MODES = ("semantic", "lexical", "hybrid", "triples")
+HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", 0.5))  # weight of cosine vs. lexical score
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 200))
+
+def hybrid_search(query, query_emb, index, k, nprobe=None, alpha=HYBRID_ALPHA, prefilter=False):
+    """Blend cosine and trigram scores: alpha * cosine + (1 - alpha) * lexical.
+
+    Candidates are the best lexical matches plus (unless ``prefilter``) the
+    dense index's own top k; only those rows are scored densely. Returns
+    (rows, blended, cosine, lexical). Caller holds STORE_LOCK.read().
+    """
+    lex_rows, lex_scores = LEXICAL_INDEX.search(query, max(HYBRID_CANDIDATES, k))
+    if prefilter and len(lex_rows):
+        rows = lex_rows
+    else:
+        dense_rows, _ = index.search(query_emb, k, nprobe=nprobe)
+        rows = np.union1d(lex_rows, dense_rows)
+    lexical = dict(zip(lex_rows.tolist(), lex_scores.tolist()))
+    missing = [r for r in rows.tolist() if r not in lexical]
+    lexical.update(zip(missing, LEXICAL_INDEX.similarity(query, missing).tolist()))
+    with STAGE_TIMINGS.time("similarity"):
+        cosine = NODE_EMBEDDINGS.matrix()[rows] @ query_emb
+    lex = np.array([lexical[r] for r in rows.tolist()], dtype=np.float32)
+    blended = alpha * cosine + (1 - alpha) * lex
+    with STAGE_TIMINGS.time("topk"):
+        idx = top_k_indices(blended, k)
+    return rows[idx], blended[idx], cosine[idx], lex[idx]
+
+def search_triples(query_emb, k, index_name, nprobe=None):
+    """Real triples ranked by the cosine of their verbalised sentence to the query."""
+    with STORE_LOCK.read():
+        positions, scores = EDGE_INDEX.search(query_emb, k, index=index_name, nprobe=nprobe)
+        triples = semantic_search_data.triples_at(positions)
+    best = {}
+    for t, sc in zip(triples, scores.tolist()):
+        t["score"] = sc
+        for n in (t["subject"], t["object"]):
+            best[n] = max(best.get(n, sc), sc)
+    return {"top_nodes": [{"name": n, "score": sc} for n, sc in best.items()],
+            "top_triples": triples, "sentences": [triple_sentence(t) for t in triples],
+            "triples": triples, "mode": "triples"}
 
 @app.route("/search", methods=["POST"])
 def semantic_search():
     data = request.json or {}
     query = (data.get("query") or "").strip()
     if not query: return jsonify({"triples": []}), 400
-    nodes = list({t["subject"] for t in semantic_search_data} | {t["object"] for t in semantic_search_data})
-    if not nodes: return jsonify({"triples": []}), 404
-    node_embs = embed_model.encode(nodes, convert_to_numpy=True)
-    query_emb = embed_model.encode([query], convert_to_numpy=True)
-    scores = cosine_similarity(query_emb, node_embs)[0]
-    top_k = min(10, len(nodes))
-    top_idx = np.argsort(scores)[::-1][:top_k]
-    top_nodes = [nodes[i] for i in top_idx]
-    top_scores = [float(scores[i]) for i in top_idx]
+    try:
+        k = max(1, min(int(data.get("k", 10)), MAX_SEARCH_K))
+        nprobe = int(data["nprobe"]) if data.get("nprobe") is not None else None
+        alpha = min(1.0, max(0.0, float(data.get("alpha", HYBRID_ALPHA))))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k and nprobe must be integers, alpha a number"}), 400
+    mode = data.get("mode") or "semantic"
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": "mode must be one of: " + ", ".join(SEARCH_MODES)}), 400
+    if mode == "triples" and EDGE_INDEX is None:
+        return jsonify({"error": "triple search is disabled (EDGE_INDEX=0)"}), 400
+    prefilter = bool(data.get("prefilter", False))
+    index_name = data.get("index") or DEFAULT_SEARCH_INDEX
+    index = VECTOR_INDEXES.get(index_name)
+    if index is None:
+        return jsonify({"error": "index must be one of: " + ", ".join(VECTOR_INDEXES)}), 400
+    if not len(NODE_EMBEDDINGS): return jsonify({"triples": []}), 404
+    cache_key = (normalise_query(query), k, index_name, nprobe, mode, alpha, prefilter,
+                 semantic_search_data.generation)
+    cached = SEARCH_RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return json_response(cached)
+    # lexical mode never touches the model
+    query_emb = encode_query(query) if mode != "lexical" else None
+    if mode == "triples":
+        out = search_triples(query_emb, k, index_name, nprobe)
+        SEARCH_RESULT_CACHE.put(cache_key, out)
+        return json_response(out)
+    extra = {}
+    with STORE_LOCK.read():
+        if mode == "lexical":
+            top_idx, scores = LEXICAL_INDEX.search(query, k)
+        elif mode == "hybrid":
+            top_idx, scores, cosine, lexical = hybrid_search(query, query_emb, index, k, nprobe=nprobe,
+                                                             alpha=alpha, prefilter=prefilter)
+            extra = {"semantic": cosine.tolist(), "lexical": lexical.tolist()}
+        else:
+            # embeddings are normalised, so the dot product is the cosine similarity
+            top_idx, scores = index.search(query_emb, k, nprobe=nprobe)
+        top_nodes = [NODE_EMBEDDINGS.nodes[i] for i in top_idx]
+    top_scores = [float(sc) for sc in scores]
     triples = [{"subject": n, "relation": "related_to", "object": n} for n in top_nodes]
-    return jsonify({"top_nodes":[{"name":n,"score":s} for n,s in zip(top_nodes,top_scores)], "triples": triples})
+    results = [{"name": n, "score": s} for n, s in zip(top_nodes, top_scores)]
+    for key, values in extra.items():
+        for r, v in zip(results, values):
+            r[key] = float(v)
+    out = {"top_nodes": results, "triples": triples, "mode": mode}
+    SEARCH_RESULT_CACHE.put(cache_key, out)
+    return json_response(out)
+
+MAX_AUTOCOMPLETE = 50
+
+@app.route("/autocomplete", methods=["GET"])
+def autocomplete():
+    """Type-ahead: node names starting with q (whole name or any later word)."""
+    prefix = (request.args.get("q") or "").strip()
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), MAX_AUTOCOMPLETE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not prefix:
+        return jsonify({"query": prefix, "suggestions": []})
+    with STORE_LOCK.read():
+        rows = LEXICAL_INDEX.complete(prefix, limit)
+        names = [NODE_EMBEDDINGS.nodes[r] for r in rows]
+        suggestions = [{"name": n, "degree": semantic_search_data.degree(n)} for n in names]
+    return json_response({"query": prefix, "suggestions": suggestions})
+
+def graph_budgets(data):
+    """node_budget/edge_budget from a request body, defaulting to and capped at the server budgets."""
+    # an edge needs the centre plus one neighbour
+    return (max(2, min(int(data.get("node_budget") or GRAPH_NODE_BUDGET), GRAPH_NODE_BUDGET)),
+            max(1, min(int(data.get("edge_budget") or GRAPH_EDGE_BUDGET), GRAPH_EDGE_BUDGET)))
 
 @app.route("/search_node", methods=["POST"])
 def search_node():
+    """A node's edges, one budgeted page at a time, with a laid-out graph of that page.
+
+    Edges are ordered by rank_node_edges(); whatever does not fit the node and
+    edge budgets is summarised per relation and fetched with next_offset.
+    """
     data = request.json or {}
     node = (data.get("node") or "").strip()
     if not node: return jsonify({"triples": [], "sentences": []}), 400
-    matched_triples = [t for t in semantic_search_data if t['subject'] == node or t['object'] == node]
-    sentences = [f"{t['subject']} {t['relation']} {t['object']}" for t in matched_triples]
-    return jsonify({"triples": matched_triples, "sentences": sentences})
+    try:
+        offset = max(0, int(data.get("offset", 0)))
+        node_budget, edge_budget = graph_budgets(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset, node_budget and edge_budget must be integers"}), 400
+    store = semantic_search_data
+    with STORE_LOCK.read():
+        node_id = store.nodes.get(node)
+        order = [] if node_id is None else rank_node_edges(store, node_id, store.edge_positions(node))
+        page, _ = budget_triples(store.triples_at(order[offset:offset + edge_budget]), node,
+                                       node_budget, edge_budget)
+        rest = order[offset + len(page):]
+        more = relation_summary(store.relations[store.r[pos]] for pos in rest)
+        degrees = node_degrees(store, page, node)
+    next_offset = offset + len(page) if rest else None
+    return json_response({
+        "node": node,
+        "triples": page,
+        "sentences": [triple_sentence(t) for t in page],
+        "total": len(order),
+        "offset": offset,
+        "next_offset": next_offset,
+        "graph": graph_payload(page, degrees, node, more),
+    })
+
+MAX_HOPS = 3
+MAX_PAGE_SIZE = 1000
+
+@app.route("/neighbourhood", methods=["POST"])
+def neighbourhood():
+    """k-hop neighbourhood of a node with optional relation filter, fan-out cap and paging."""
+    data = request.json or {}
+    node = (data.get("node") or "").strip()
+    if not node: return jsonify({"triples": [], "nodes": []}), 400
+    try:
+        hops = max(1, min(int(data.get("hops", 1)), MAX_HOPS))
+        max_fanout = int(data["max_fanout"]) if data.get("max_fanout") is not None else 100
+        offset = max(0, int(data.get("offset", 0)))
+        limit = max(1, min(int(data.get("limit", 100)), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "hops, max_fanout, offset and limit must be integers"}), 400
+    direction = data.get("direction", "both")
+    if direction not in ("in", "out", "both"):
+        return jsonify({"error": "direction must be in, out or both"}), 400
+    relations = data.get("relations")
+    if relations is not None and not isinstance(relations, list):
+        return jsonify({"error": "relations must be a list"}), 400
+    with STORE_LOCK.read():
+        order, distance, truncated = semantic_search_data.neighbourhood(
+            node, hops=hops, relations=relations, direction=direction, max_fanout=max(1, max_fanout))
+        page = semantic_search_data.triples_at(order[offset:offset + limit])
+        shown, dropped = budget_triples(page, node)
+        degrees = node_degrees(semantic_search_data, shown, node)
+    more = relation_summary(t["relation"] for t in dropped)
+    return json_response({
+        "node": node,
+        "triples": page,
+        "graph": graph_payload(shown, degrees, node, more),
+        "nodes": [{"name": n, "hop": h} for n, h in distance.items()],
+        "total": len(order),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < len(order) else None,
+        "truncated": truncated,
+    })
+
+MAX_EDIT_TRIPLES = 10000
+
+def _edit_triples(data):
+    triples = data.get("triples", [])
+    if not isinstance(triples, list) or not all(isinstance(t, dict) for t in triples):
+        raise ValueError("triples must be a list of {subject, relation, object} objects")
+    if len(triples) > MAX_EDIT_TRIPLES:
+        raise ValueError(f"at most {MAX_EDIT_TRIPLES} triples per request")
+    return [_triple_from_values(*(t.get(c) for c in TRIPLE_COLUMNS)) for t in triples]
+
+@app.route("/triples/delete", methods=["POST"])
+def delete_triples_route():
+    """Delete the listed triples and every edge of the listed nodes."""
+    data = request.json or {}
+    try:
+        triples = [t for t in _edit_triples(data) if t is not None]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    nodes = data.get("nodes", [])
+    if not isinstance(nodes, list):
+        return jsonify({"error": "nodes must be a list of names"}), 400
+    not_found = []
+    def select(store):
+        positions = []
+        for t in triples:
+            pos = store.find(t["subject"], t["relation"], t["object"])
+            if pos is None:
+                not_found.append(t)
+            else:
+                positions.append(pos)
+        for node in nodes:
+            positions.extend(store.edge_positions(str(node)))
+        return positions
+    removed = delete_triples(select)
+    return jsonify({"deleted": len(removed), "not_found": len(not_found),
+                    "triples_total": semantic_search_data.live_triples})
+
+@app.route("/triples/upsert", methods=["POST"])
+def upsert_triples_route():
+    """Add triples, or update the types of ones already present; synchronous, up to MAX_EDIT_TRIPLES."""
+    try:
+        triples = _edit_triples(request.json or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    valid = [t for t in triples if t is not None]
+    if not valid:
+        return jsonify({"error": "no valid triples"}), 400
+    added, duplicates, updated = commit_triples(valid, upsert=True)
+    recalc_node_counts()
+    return jsonify({"added": len(added), "updated": len(updated), "unchanged": duplicates,
+                    "skipped": len(triples) - len(valid), "triples_total": semantic_search_data.live_triples})
+
+@app.route("/compact", methods=["POST"])
+def compact():
+    """Drop every tombstoned triple and retired embedding row now instead of waiting for the threshold."""
+    return jsonify(compact_store(force=True))
+
+# -------------------------
+# Export
+# -------------------------
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+EXPORT_CHUNK = int(os.environ.get("EXPORT_CHUNK", 10000))
+
+def iter_triple_chunks(end=None, chunk=EXPORT_CHUNK):
+    """Live triples among the first ``end`` positions (default: all), ``chunk`` positions at a time.
+
+    The read lock is held per chunk only, so a long download never blocks
+    ingest; triples added after the export started are not included, and
+    compaction (which would move positions) waits until the export ends.
+    """
+    token = object()
+    try:
+        with STORE_LOCK.read():  # so no compaction can run between registering and reading end
+            OPEN_CURSORS.add(token)
+            if end is None:
+                end = len(semantic_search_data)
+        for start in range(0, end, chunk):
+            with STORE_LOCK.read():
+                store = semantic_search_data
+                triples = store.triples_at(store.live_positions(start, min(start + chunk, end)))
+            yield triples
+    finally:
+        OPEN_CURSORS.discard(token)
+
+class _ChunkSink:
+    """Write-only file object collecting bytes for a streamed response (ParquetWriter target)."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        out = b"".join(self.chunks)
+        self.chunks = []
+        return out
+
+def export_ndjson(chunks):
+    for triples in chunks:
+        yield "".join(json.dumps(t, ensure_ascii=False) + "\n" for t in triples).encode()
+
+def export_csv(chunks):
+    for triples in chunks:
+        out = io.StringIO()
+        csv.writer(out).writerows((t["subject"], t["relation"], t["object"]) for t in triples)
+        yield out.getvalue().encode()
+
+def export_parquet(chunks):
+    """One row group per chunk, flushed to the client as soon as it is written."""
+    pa = optional_pyarrow()
+    schema = pa.schema([(c, pa.string()) for c in TRIPLE_COLUMNS])
+    sink = _ChunkSink()
+    with pa.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for triples in chunks:
+            writer.write_table(pa.Table.from_pydict({c: [t[c] for t in triples] for c in TRIPLE_COLUMNS}, schema=schema))
+            yield sink.drain()
+    yield sink.drain()  # footer
+
+def gzip_stream(parts, level=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for part in parts:
+        data = z.compress(part)
+        if data:
+            yield data
+    yield z.flush()
+
+@app.route("/export", methods=["GET"])
+def export():
+    """Stream the whole store as NDJSON (default), CSV or Parquet; ?gzip=1 compresses NDJSON/CSV."""
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be one of: " + ", ".join(EXPORT_FORMATS)}), 400
+    if fmt == "parquet" and optional_pyarrow() is None:
+        return jsonify({"error": "Parquet export needs pyarrow (pip install pyarrow)"}), 400
+    compress = request.args.get("gzip") == "1" and fmt != "parquet"  # parquet pages are compressed already
+    live = semantic_search_data.live_triples
+    body = {"ndjson": export_ndjson, "csv": export_csv, "parquet": export_parquet}[fmt](iter_triple_chunks())
+    filename = f"knowledge-graph.{fmt}"
+    mimetype = EXPORT_FORMATS[fmt]
+    if compress:
+        body, filename, mimetype = gzip_stream(body), filename + ".gz", "application/gzip"
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Triples-Total": str(live),
+    })
 
 # -------------------------
 # Run
 # -------------------------
-if _name_ == "_main_":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+def read_corpus(path):
+    """One document per line; .jsonl files take the "text" field of each object."""
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line).get("text", "") if path.endswith(".jsonl") else line
+
+def analyze_corpus_cli(args):
+    """Extract triples from a corpus file, optionally writing them as CSV, and report docs/s."""
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else None
+    writer = csv.writer(out) if out else None
+    n_docs = n_triples = 0
+    t0 = time.time()
+    try:
+        for triples in extract_corpus(read_corpus(args.corpus), batch_size=args.batch_size, n_process=args.n_process):
+            n_docs += 1
+            n_triples += len(triples)
+            if writer:
+                writer.writerows((t["subject"], t["relation"], t["object"]) for t in triples)
+    finally:
+        if out:
+            out.close()
+    elapsed = time.time() - t0
+    print(f"{n_docs} documents, {n_triples} triples in {elapsed:.2f}s "
+          f"({n_docs / elapsed if elapsed > 0 else 0:.1f} docs/s, batch_size={args.batch_size}, n_process={args.n_process})")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="SemanticApp server and tools")
+    sub = parser.add_subparsers(dest="command")
+    corpus = sub.add_parser("analyze-corpus", help="extract triples from a text corpus with nlp.pipe")
+    corpus.add_argument("corpus", help="text file (one document per line) or .jsonl with a text field")
+    corpus.add_argument("--out", help="write extracted triples to this CSV (loadable via /upload)")
+    corpus.add_argument("--batch-size", type=int, default=NLP_BATCH_SIZE)
+    corpus.add_argument("--n-process", type=int, default=1)
+    export = sub.add_parser("export-onnx", help="export the embedding model to ONNX (+ int8) for EMBED_BACKEND=onnx")
+    export.add_argument("--model", default=EMBED_MODEL_NAME)
+    export.add_argument("--out", default=None, help="output directory (default: the EMBED_BACKEND=onnx cache path)")
+    export.add_argument("--no-quantize", action="store_true", help="skip the dynamically quantised int8 copy")
+    args = parser.parse_args()
+    if args.command == "analyze-corpus":
+        analyze_corpus_cli(args)
+    elif args.command == "export-onnx":
+        print(f"wrote {export_onnx(args.model, args.out or onnx_model_dir(args.model), quantize=not args.no_quantize)}")
+    else:
+        app.run(debug=True, port=5000)
\ No newline at end of file
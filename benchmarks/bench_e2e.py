@@ -0,0 +1,173 @@
+"""End-to-end benchmark: ingest and query latency of the Flask app at growing graph sizes.
+
+Each scale runs in a fresh process: a synthetic power-law graph (see
+synthetic_graph.py) is uploaded through /upload in chunks, then
+/search (semantic, hybrid and triples), /autocomplete, /search_node,
+/recent_triples and /analyze are timed through the test client.
+Results (p50/p95/p99 ms, req/s, ingest triples/s, peak RSS) are printed and
+written as JSON; --baseline compares against a previous run.
+
+    python benchmarks/bench_e2e.py --scales 10000 100000 1000000 --out e2e.json
+    python benchmarks/bench_e2e.py --scales 10000 --baseline e2e.json
+"""
+import argparse, io, json, os, platform, resource, subprocess, sys, time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+import synthetic_graph  # noqa: E402
+
+ANALYZE_TEXTS = ["Marie Curie discovered polonium in Paris.",
+                 "The treaty was signed by France and Spain in 1659.",
+                 "Alan Turing developed the theory of computation at Cambridge."]
+
+
+def percentiles(latencies_ms, elapsed):
+    lat = np.array(latencies_ms)
+    return {"n": len(lat), "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(lat, 95)), 3), "p99_ms": round(float(np.percentile(lat, 99)), 3),
+            "rps": round(len(lat) / elapsed, 1) if elapsed > 0 else None}
+
+
+def wait_job(client, resp):
+    status_url = resp.get_json()["status_url"]
+    while True:
+        job = client.get(status_url).get_json()
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.005)
+
+
+def timed(requests):
+    """Run zero-arg callables back to back; returns latency stats."""
+    latencies = []
+    t0 = time.perf_counter()
+    for call in requests:
+        t = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - t) * 1000)
+    return percentiles(latencies, time.perf_counter() - t0)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scale(args):
+    """Child process: build one graph size and time every endpoint."""
+    import Knowledge_mapping_using_ai as app_module
+    client = app_module.app.test_client()
+    rng = np.random.default_rng(args.seed)
+    nodes = args.nodes or max(10, args.triples // 5)
+
+    latencies, rows_sent = [], 0
+    t0 = time.perf_counter()
+    for i, chunk in enumerate(synthetic_graph.generate(args.triples, nodes, args.relations, args.exponent,
+                                                       args.seed, chunk=args.chunk)):
+        data = synthetic_graph.to_csv_bytes(chunk)
+        t = time.perf_counter()
+        resp = client.post("/upload", data={"file": (io.BytesIO(data), f"synthetic{i}.csv")},
+                           content_type="multipart/form-data")
+        job = wait_job(client, resp)
+        latencies.append((time.perf_counter() - t) * 1000)
+        assert job["state"] == "done", job
+        rows_sent += len(chunk)
+    ingest_s = time.perf_counter() - t0
+    stats = client.get("/stats").get_json()
+    ingest = percentiles(latencies, ingest_s)
+    ingest.update({"rows": rows_sent, "seconds": round(ingest_s, 2),
+                   "triples_per_s": round(stats["triples_total"] / ingest_s, 1)})
+
+    words = synthetic_graph.WORDS
+
+    def query(i):
+        return f"{words[i % len(words)]} {words[(i * 5 + 1) % len(words)]}"
+
+    probe = [synthetic_graph.node_name(int(n)) for n in rng.integers(0, nodes, args.requests)]
+    endpoints = {
+        # distinct queries so the result/embedding caches do not flatter the numbers
+        "search": timed(lambda i=i: client.post("/search", json={"query": f"{query(i)} {i}"})
+                        for i in range(args.requests)),
+        "search_hybrid": timed(lambda i=i: client.post("/search", json={"query": f"{query(i)} {i}", "mode": "hybrid"})
+                               for i in range(args.requests)),
+        "search_triples": timed(lambda i=i: client.post("/search", json={"query": f"{query(i)} relation {i}",
+                                                                          "mode": "triples"})
+                                for i in range(args.requests)),
+        "autocomplete": timed(lambda n=n: client.get("/autocomplete", query_string={"q": n[:4]}) for n in probe),
+        "search_node": timed(lambda n=n: client.post("/search_node", json={"node": n}) for n in probe),
+        "recent_triples": timed(lambda: client.get("/recent_triples") for _ in range(args.requests)),
+        "analyze": timed(lambda i=i: wait_job(client, client.post("/analyze", json={
+            "text": ANALYZE_TEXTS[i % len(ANALYZE_TEXTS)] + f" Report {i}."})) for i in range(args.analyze_requests)),
+    }
+    return {"triples": args.triples, "triples_stored": stats["triples_total"], "nodes": stats["unique_nodes"],
+            "ingest": ingest, "endpoints": endpoints, "peak_rss_mb": peak_rss_mb()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_scale(res, base=None):
+    print(f"\n{res['triples']:,} triples requested: {res['triples_stored']:,} stored, {res['nodes']:,} nodes, "
+          f"peak RSS {res['peak_rss_mb']} MB, ingest {res['ingest']['triples_per_s']:,} triples/s")
+    print(f"  {'endpoint':<15} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'vs base p95':>12}")
+    rows = dict(res["endpoints"], upload=res["ingest"])
+    for name, r in rows.items():
+        delta = ""
+        if base is not None:
+            old = dict(base["endpoints"], upload=base["ingest"]).get(name)
+            if old and old["p95_ms"]:
+                delta = f"{(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"  {name:<15} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['rps'] or 0:>9.1f} {delta:>12}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--nodes", type=int, default=None, help="distinct nodes per scale (default: triples / 5)")
+    ap.add_argument("--relations", type=int, default=50)
+    ap.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent of the degree distribution")
+    ap.add_argument("--chunk", type=int, default=50000, help="rows per /upload request")
+    ap.add_argument("--requests", type=int, default=200, help="timed requests per query endpoint")
+    ap.add_argument("--analyze-requests", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_e2e.json", help="JSON results path")
+    ap.add_argument("--baseline", default=None, help="previous --out file to compare p95 against")
+    ap.add_argument("--triples", type=int, default=None, help=argparse.SUPPRESS)  # child mode
+    args = ap.parse_args()
+
+    if args.triples is not None:
+        print(json.dumps(run_scale(args)))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = {r["triples"]: r for r in json.load(fh)["scales"]}
+    child_args = list(sys.argv[1:])
+    results = []
+    for n in args.scales:
+        # a fresh interpreter per scale keeps graphs and peak RSS independent
+        out = subprocess.run([sys.executable, __file__, *child_args, "--triples", str(n)],
+                             check=True, stdout=subprocess.PIPE, text=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        results.append(res)
+        print_scale(res, baseline.get(n))
+    report = {"commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "machine": platform.machine(),
+              "config": {k: v for k, v in vars(args).items() if k not in ("triples", "out", "baseline")},
+              "scales": results}
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
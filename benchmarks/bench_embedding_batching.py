@@ -0,0 +1,64 @@
+"""Load test: concurrent single-query encodes, direct model calls vs. the micro-batcher.
+
+Each client thread encodes --requests distinct one-line queries back to back,
+the way concurrent /search calls do.
+
+    python benchmarks/bench_embedding_batching.py --clients 1 8 64
+"""
+import argparse, os, sys, threading, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Knowledge_mapping_using_ai as app_module  # noqa: E402
+
+
+def run(encode, clients, requests):
+    latencies = [[] for _ in range(clients)]
+    barrier = threading.Barrier(clients + 1)
+
+    def client(i):
+        barrier.wait()
+        for j in range(requests):
+            t0 = time.perf_counter()
+            encode([f"query {i} {j} about some node"])
+            latencies[i].append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.concatenate([np.array(x) for x in latencies])
+    return clients * requests / elapsed, np.percentile(lat, 50), np.percentile(lat, 95)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    ap.add_argument("--requests", type=int, default=50, help="encodes per client")
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--max-wait-ms", type=float, default=5)
+    args = ap.parse_args()
+
+    app_module.EMBED_MODEL.warm_up()
+    batcher = app_module.EmbeddingBatcher(app_module.encode_direct, max_batch=args.max_batch,
+                                          max_wait_ms=args.max_wait_ms)
+    batched = lambda texts: batcher.encode(texts, interactive=True)  # noqa: E731
+
+    print(f"{'clients':>7} {'mode':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'gain':>6}")
+    for clients in args.clients:
+        base = run(app_module.encode_direct, clients, args.requests)
+        print(f"{clients:>7} {'direct':<8} {base[0]:>9.1f} {base[1]:>9.2f} {base[2]:>9.2f} {1.0:>6.2f}")
+        res = run(batched, clients, args.requests)
+        print(f"{clients:>7} {'batched':<8} {res[0]:>9.1f} {res[1]:>9.2f} {res[2]:>9.2f} {res[0] / base[0]:>6.2f}")
+    stats = batcher.stats()
+    print(f"batcher: {stats['batches']} batches, mean size {stats['mean_batch_size']}")
+    print("histogram: " + ", ".join(f"<={h['le']}: {h['count']}" for h in stats["batch_size_histogram"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Embedding backends: cold-load time, encode throughput, RSS and agreement with PyTorch.
+
+Each backend (torch, onnx, onnx-int8) is measured in a fresh interpreter so
+import and model-load costs are counted from scratch. The embeddings of a
+shared text sample are compared against the first backend listed: per-row
+cosine (mean/min) and the overlap of each row's top-10 neighbours, which is
+what search results actually depend on.
+
+    python Knowledge_mapping_using_ai.py export-onnx   # once, needs network
+    python benchmarks/bench_encoders.py --backends torch onnx onnx-int8
+"""
+import argparse, json, os, subprocess, sys, tempfile
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HERE, "..")
+
+CHILD = r"""
+import json, os, resource, sys, time
+import numpy as np
+sys.path.insert(0, {repo!r})
+sys.path.insert(0, {here!r})
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+import synthetic_graph
+out = {{"rss_start_mb": rss_mb()}}
+t0 = time.perf_counter()
+import Knowledge_mapping_using_ai as app_module
+encoder = app_module.load_encoder()
+out["load_s"] = time.perf_counter() - t0
+t = time.perf_counter(); encoder.encode(["who was born in Ulm"]); out["first_encode_ms"] = (time.perf_counter() - t) * 1000
+out["load_total_s"] = time.perf_counter() - t0
+
+texts = [synthetic_graph.node_name(i) for i in range({n_texts})]
+texts += [f"{{a}} relation_{{i % 50}} {{b}}" for i, (a, b) in enumerate(zip(texts[::2], texts[1::2]))]
+for batch in {batches}:
+    chunks = [texts[i:i + batch] for i in range(0, min(len(texts), batch * {calls}), batch)]
+    t = time.perf_counter()
+    for chunk in chunks:
+        encoder.encode(chunk)
+    elapsed = time.perf_counter() - t
+    out[f"texts_per_s@{{batch}}"] = sum(map(len, chunks)) / elapsed
+out["rss_loaded_mb"] = rss_mb()
+np.save({npy!r}, np.asarray(encoder.encode(texts), dtype=np.float32))
+print(json.dumps(out))
+"""
+
+
+def run_child(backend, args, npy):
+    env = dict(os.environ, EMBED_BACKEND="onnx" if backend.startswith("onnx") else backend,
+               EMBED_QUANTIZE="int8" if backend == "onnx-int8" else "", WARMUP_MODELS="0",
+               EMBED_THREADS=str(args.threads))
+    code = CHILD.format(repo=REPO, here=HERE, n_texts=args.texts, batches=args.batch_sizes,
+                        calls=args.calls, npy=npy)
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    if proc.returncode:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def agreement(ref, other, k=10):
+    cos = (ref * other).sum(axis=1)
+    top_ref = np.argsort(-(ref @ ref.T), axis=1)[:, 1:k + 1]
+    top_other = np.argsort(-(other @ other.T), axis=1)[:, 1:k + 1]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_other)])
+    return {"cosine_mean": float(cos.mean()), "cosine_min": float(cos.min()), f"top{k}_overlap": float(overlap)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                    help="the first one is the reference for agreement")
+    ap.add_argument("--texts", type=int, default=2000, help="node names (plus half as many triple sentences)")
+    ap.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 128])
+    ap.add_argument("--calls", type=int, default=50, help="encode calls timed per batch size")
+    ap.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads (0 = runtime default)")
+    ap.add_argument("--export", action="store_true", help="export the ONNX model first if it is missing")
+    ap.add_argument("--out", default=None, help="also write the results as JSON")
+    args = ap.parse_args()
+
+    if args.export and any(b.startswith("onnx") for b in args.backends):
+        sys.path.insert(0, REPO)
+        import Knowledge_mapping_using_ai as app_module
+        if not os.path.exists(os.path.join(app_module.onnx_model_dir(), "model.onnx")):
+            app_module.export_onnx()
+
+    results, embeddings = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            npy = os.path.join(tmp, backend + ".npy")
+            results[backend] = run_child(backend, args, npy)
+            if "error" not in results[backend]:
+                embeddings[backend] = np.load(npy)
+    ref = args.backends[0]
+    for backend in args.backends[1:]:
+        if ref not in embeddings or backend not in embeddings:
+            continue
+        if embeddings[ref].shape != embeddings[backend].shape:
+            results[backend]["error"] = f"dimension {embeddings[backend].shape[1]} != {embeddings[ref].shape[1]} ({ref})"
+        else:
+            results[backend].update(agreement(embeddings[ref], embeddings[backend]))
+
+    keys = ["load_s", "first_encode_ms", "load_total_s", "rss_loaded_mb"]
+    keys += [f"texts_per_s@{b}" for b in args.batch_sizes] + ["cosine_mean", "cosine_min", "top10_overlap"]
+    print(f"{'metric':<22}" + "".join(f"{b:>14}" for b in args.backends))
+    for key in keys:
+        cells = [results[b].get(key) for b in args.backends]
+        print(f"{key:<22}" + "".join(f"{c:>14.3f}" if c is not None else f"{'-':>14}" for c in cells))
+    for backend, res in results.items():
+        if "error" in res:
+            print(f"{backend}: {res['error']}")
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
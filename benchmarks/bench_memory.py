@@ -0,0 +1,72 @@
+"""Bytes per triple: list-of-dicts + key set vs. the columnar TripleStore.
+
+Rows are generated the way csv.reader produces them (fresh string objects per
+row), so the baseline pays for duplicate name strings the way /upload used to.
+
+    python benchmarks/bench_memory.py --triples 200000 --nodes 50000
+"""
+import argparse, os, random, sys, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Knowledge_mapping_using_ai as app_module  # noqa: E402
+
+
+def rows(n, nodes, relations, seed):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        # "".join builds a new str each time, like csv.reader does per row
+        yield {
+            "subject": "".join(("node_", str(rnd.randrange(nodes)))),
+            "relation": "".join(("rel_", str(rnd.randrange(relations)))),
+            "object": "".join(("node_", str(rnd.randrange(nodes)))),
+            "type_subject": None,
+            "type_object": None,
+        }
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, used
+
+
+def build_dicts(args):
+    triples, keys = [], set()
+    for t in rows(args.triples, args.nodes, args.relations, args.seed):
+        k = (t["subject"], t["relation"], t["object"])
+        if k not in keys:
+            keys.add(k); triples.append(t)
+    return triples, keys
+
+
+def build_columnar(args):
+    store = app_module.TripleStore()
+    for t in rows(args.triples, args.nodes, args.relations, args.seed):
+        store.add(t)
+    return store
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--triples", type=int, default=200000)
+    ap.add_argument("--nodes", type=int, default=50000)
+    ap.add_argument("--relations", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    (triples, _), before = measure(lambda: build_dicts(args))
+    n_before = len(triples)
+    del triples
+    store, after = measure(lambda: build_columnar(args))
+    n_after = len(store)
+
+    print(f"{'representation':<26} {'triples':>9} {'MiB':>9} {'bytes/triple':>13}")
+    print(f"{'dicts + key set':<26} {n_before:>9} {before / 2**20:>9.1f} {before / max(1, n_before):>13.1f}")
+    print(f"{'columnar TripleStore':<26} {n_after:>9} {after / 2**20:>9.1f} {after / max(1, n_after):>13.1f}")
+    print(f"reduction: {before / max(1, after):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
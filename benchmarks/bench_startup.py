@@ -0,0 +1,79 @@
+"""Process start-up cost: cold (lazy) model loading vs. background warm-up.
+
+Each scenario runs in a fresh interpreter so import and model-load costs are
+measured from scratch.
+
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse, json, os, subprocess, sys
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = r"""
+import json, os, resource, sys, time
+sys.path.insert(0, {repo!r})
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+out = {{}}
+t0 = time.perf_counter()
+import Knowledge_mapping_using_ai as app_module
+out["import_s"] = time.perf_counter() - t0
+out["rss_after_import_mb"] = rss_mb()
+client = app_module.app.test_client()
+
+t = time.perf_counter(); client.get("/stats"); out["first_stats_ms"] = (time.perf_counter() - t) * 1000
+if os.environ.get("WARMUP_MODELS") == "1":
+    t = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        if any(m.state == "failed" for m in app_module.MODELS.values()):
+            break
+        time.sleep(0.01)
+    out["ready_s"] = time.perf_counter() - t0
+
+t = time.perf_counter(); app_module.encode_texts(["who was born in Ulm"]); out["first_encode_ms"] = (time.perf_counter() - t) * 1000
+t = time.perf_counter(); app_module.encode_texts(["who was born in Ulm"]); out["second_encode_ms"] = (time.perf_counter() - t) * 1000
+t = time.perf_counter(); list(app_module.extract_corpus(["Einstein was born in Ulm."])); out["first_parse_ms"] = (time.perf_counter() - t) * 1000
+t = time.perf_counter(); list(app_module.extract_corpus(["Einstein was born in Ulm."])); out["second_parse_ms"] = (time.perf_counter() - t) * 1000
+out["rss_loaded_mb"] = rss_mb()
+print(json.dumps(out))
+"""
+
+
+def run_child(warmup):
+    env = dict(os.environ, WARMUP_MODELS="1" if warmup else "0")
+    proc = subprocess.run([sys.executable, "-c", CHILD.format(repo=REPO)], env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    keys = ["import_s", "rss_after_import_mb", "first_stats_ms", "ready_s", "first_encode_ms",
+            "second_encode_ms", "first_parse_ms", "second_parse_ms", "rss_loaded_mb"]
+    print(f"{'metric':<22} {'cold (lazy)':>12} {'warm-up':>12}")
+    results = {False: [], True: []}
+    for _ in range(args.runs):
+        for warmup in (False, True):
+            results[warmup].append(run_child(warmup))
+    for key in keys:
+        row = []
+        for warmup in (False, True):
+            values = [r[key] for r in results[warmup] if key in r]
+            row.append(f"{sum(values) / len(values):>12.2f}" if values else f"{'-':>12}")
+        print(f"{key:<22} {row[0]} {row[1]}")
+
+
+if __name__ == "__main__":
+    main()
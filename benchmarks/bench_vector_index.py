@@ -0,0 +1,70 @@
+"""Recall vs. latency of the IVF search backend against the exact one.
+
+Vectors are synthetic (clustered, L2-normalised) and are fed through the app's
+NodeEmbeddingStore, so no model inference is involved in the measurement.
+
+    python benchmarks/bench_vector_index.py --n 200000 --nprobe 1 4 8 16 32
+"""
+import argparse, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Knowledge_mapping_using_ai as app_module  # noqa: E402
+
+
+def synthetic_vectors(n, dim, clusters, rng):
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vecs = centres[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
+
+
+def timed_search(index, queries, k, **params):
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = index.search(q, k, **params)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(set(rows.tolist()))
+    return results, np.array(latencies)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=200000, help="number of stored vectors")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--clusters", type=int, default=256, help="clusters in the synthetic data")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--batch", type=int, default=50000, help="ingest batch size (exercises incremental adds)")
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vecs = synthetic_vectors(args.n, args.dim, args.clusters, rng)
+    queries = synthetic_vectors(args.queries, args.dim, args.clusters, rng)
+
+    store = app_module.NodeEmbeddingStore(encode=lambda names: vecs[[int(n) for n in names]])
+    exact = app_module.ExactIndex(store)
+    ivf = app_module.IVFIndex(store)
+    t0 = time.perf_counter()
+    for start in range(0, args.n, args.batch):
+        rows = store.add([str(i) for i in range(start, min(args.n, start + args.batch))])
+        ivf.add(rows)
+    print(f"ingested {args.n} vectors (dim {args.dim}) in {time.perf_counter() - t0:.2f}s, "
+          f"{ivf.n_lists} IVF lists")
+
+    truth, exact_lat = timed_search(exact, queries, args.k)
+    print(f"{'backend':<8} {'nprobe':>6} {'recall@' + str(args.k):>10} {'mean ms':>9} {'p95 ms':>9} {'speedup':>8}")
+    print(f"{'exact':<8} {'-':>6} {1.0:>10.3f} {exact_lat.mean():>9.3f} {np.percentile(exact_lat, 95):>9.3f} {1.0:>8.2f}")
+    for nprobe in args.nprobe:
+        found, lat = timed_search(ivf, queries, args.k, nprobe=nprobe)
+        recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+        print(f"{'ivf':<8} {nprobe:>6} {recall:>10.3f} {lat.mean():>9.3f} {np.percentile(lat, 95):>9.3f} "
+              f"{exact_lat.mean() / lat.mean():>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
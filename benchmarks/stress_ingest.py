@@ -0,0 +1,155 @@
+"""Stress test: parallel overlapping uploads and searches must leave consistent counts.
+
+Threaded mode drives one app through its test client: --uploads CSVs, each
+sharing most of its rows with the others, are ingested concurrently while
+--searchers threads query /search. Shared mode starts --processes worker
+processes on one SNAPSHOT_DIR with SHARED_STORE=1 and checks that a fresh
+process restores exactly the union of what they ingested.
+
+    python benchmarks/stress_ingest.py --uploads 16 --rows 2000
+    python benchmarks/stress_ingest.py --processes 4
+"""
+import argparse, io, os, subprocess, sys, tempfile, threading, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+
+def csv_for(i, rows, overlap):
+    """Rows 0..overlap are shared by every upload, the rest are unique to upload i."""
+    lines = [f"hub {j},links,hub {j + 1}" for j in range(overlap)]
+    lines += [f"u{i} node {j},mentions,hub {j % max(overlap, 1)}" for j in range(rows - overlap)]
+    return ("\n".join(lines) + "\n").encode(), set(lines)
+
+
+def expected(uploads, rows, overlap, offset=0):
+    triples = set()
+    for i in range(offset, offset + uploads):
+        triples |= csv_for(i, rows, overlap)[1]
+    nodes = set()
+    for t in triples:
+        s, _, o = t.split(",")
+        nodes.update((s, o))
+    return len(triples), len(nodes)
+
+
+def upload_all(client, uploads, rows, overlap, offset=0):
+    """Submit every upload at once and wait for all jobs; returns their results."""
+    def post(i):
+        data, _ = csv_for(i, rows, overlap)
+        while True:
+            r = client.post("/upload", data={"file": (io.BytesIO(data), f"stress{i}.csv")},
+                            content_type="multipart/form-data")
+            if r.status_code == 202:
+                return r.get_json()["status_url"]
+            time.sleep(float(r.headers.get("Retry-After", 1)))  # queue full: back off like a client would
+
+    urls = [post(i) for i in range(offset, offset + uploads)]
+    results = []
+    for url in urls:
+        while True:
+            job = client.get(url).get_json()
+            if job["state"] in ("done", "failed"):
+                results.append(job)
+                break
+            time.sleep(0.05)
+    return results
+
+
+def check(app_module, n_triples, n_nodes, files):
+    stats = app_module.stats_payload()
+    checks = [("triples_total", stats["triples_total"], n_triples),
+              ("unique_nodes", stats["unique_nodes"], n_nodes),
+              ("embeddings", len(app_module.NODE_EMBEDDINGS), n_nodes),
+              ("files_uploaded", stats["files_uploaded"], files)]
+    if app_module.EDGE_INDEX is not None:
+        checks.append(("edge_embeddings", len(app_module.EDGE_INDEX), n_triples))
+    ok = True
+    for name, got, want in checks:
+        flag = "ok" if got == want else "MISMATCH"
+        ok &= got == want
+        print(f"  {name:<15} {got:>9} expected {want:>9}  {flag}")
+    return ok
+
+
+def threaded(args):
+    import Knowledge_mapping_using_ai as app_module
+    client = app_module.app.test_client()
+    stop = threading.Event()
+    searches = [0] * args.searchers
+    errors = []
+
+    def searcher(i):
+        c = app_module.app.test_client()
+        while not stop.is_set():
+            r = c.post("/search", json={"query": f"hub {searches[i] % 50}"})
+            if r.status_code not in (200, 404):
+                errors.append(r.status_code)
+            searches[i] += 1
+
+    threads = [threading.Thread(target=searcher, args=(i,)) for i in range(args.searchers)]
+    for t in threads:
+        t.start()
+    t0 = time.perf_counter()
+    results = upload_all(client, args.uploads, args.rows, args.overlap)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    for t in threads:
+        t.join()
+
+    failed = [j for j in results if j["state"] != "done"]
+    added = sum(j["result"]["triples_added"] for j in results if j["state"] == "done")
+    n_triples, n_nodes = expected(args.uploads, args.rows, args.overlap)
+    print(f"{args.uploads} uploads x {args.rows} rows in {elapsed:.2f}s, "
+          f"{sum(searches)} searches alongside ({len(errors)} errors), {len(failed)} failed jobs")
+    ok = check(app_module, n_triples, n_nodes, args.uploads)
+    ok &= added == n_triples and not failed and not errors
+    print(f"  {'triples_added':<15} {added:>9} expected {n_triples:>9}  {'ok' if added == n_triples else 'MISMATCH'}")
+    return ok
+
+
+def shared_worker(args):
+    """Child process: ingest this worker's share of the uploads into the shared store."""
+    import Knowledge_mapping_using_ai as app_module
+    results = upload_all(app_module.app.test_client(), args.uploads, args.rows, args.overlap,
+                         offset=args.worker * args.uploads)
+    assert all(j["state"] == "done" for j in results), results
+    app_module.SNAPSHOT.save()
+
+
+def shared(args):
+    directory = tempfile.mkdtemp(prefix="stress-shared-")
+    env = dict(os.environ, SNAPSHOT_DIR=directory, SHARED_STORE="1")
+    t0 = time.perf_counter()
+    children = [subprocess.Popen([sys.executable, __file__, "--worker", str(w), "--uploads", str(args.uploads),
+                                  "--rows", str(args.rows), "--overlap", str(args.overlap)], env=env)
+                for w in range(args.processes)]
+    if any(p.wait() for p in children):
+        print("a worker process failed")
+        return False
+    elapsed = time.perf_counter() - t0
+    os.environ.update(env)
+    import Knowledge_mapping_using_ai as app_module  # restores from the shared directory
+    n_triples, n_nodes = expected(args.processes * args.uploads, args.rows, args.overlap)
+    print(f"{args.processes} processes x {args.uploads} uploads x {args.rows} rows in {elapsed:.2f}s ({directory})")
+    return check(app_module, n_triples, n_nodes, args.processes * args.uploads)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--uploads", type=int, default=16, help="uploads (per process in shared mode)")
+    ap.add_argument("--rows", type=int, default=2000, help="rows per uploaded CSV")
+    ap.add_argument("--overlap", type=int, default=1000, help="rows every upload has in common")
+    ap.add_argument("--searchers", type=int, default=4, help="threads searching during ingest")
+    ap.add_argument("--processes", type=int, default=0, help="run the shared-store multi-process variant")
+    ap.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker is not None:
+        return shared_worker(args)
+    ok = shared(args) if args.processes else threaded(args)
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Synthetic knowledge-graph generator with a power-law degree distribution.
+
+Endpoints are drawn from a Zipf-like distribution over node ranks (a few hubs,
+a long tail), relations from a smaller Zipf vocabulary. Node names are short
+word phrases so semantic search has something to match on.
+
+    python benchmarks/synthetic_graph.py --triples 100000 --nodes 20000 --out graph.csv
+"""
+import argparse, sys
+
+import numpy as np
+
+WORDS = ("alpha beta gamma delta river mountain city protein gene market theory engine "
+         "network signal crystal forest ocean planet vaccine library court treaty enzyme "
+         "circuit algorithm dynasty empire galaxy mineral novel opera satellite").split()
+
+
+def zipf_probs(n, exponent):
+    p = 1.0 / np.arange(1, n + 1) ** exponent
+    return p / p.sum()
+
+
+def node_name(i):
+    """Deterministic two-word name plus the id, e.g. 'river enzyme 1234'."""
+    return f"{WORDS[i % len(WORDS)]} {WORDS[(i * 7 + 3) % len(WORDS)]} {i}"
+
+
+def generate(triples, nodes=None, relations=50, exponent=1.1, seed=0, chunk=100000):
+    """Yield lists of (subject, relation, object) name tuples, ``chunk`` at a time.
+
+    Self-loops are dropped and duplicates are kept, like real uploads; the
+    store deduplicates them.
+    """
+    nodes = nodes or max(10, triples // 5)
+    rng = np.random.default_rng(seed)
+    node_p = zipf_probs(nodes, exponent)
+    rel_p = zipf_probs(relations, exponent)
+    # shuffle ranks so hub ids are not simply 0, 1, 2, ...
+    perm = rng.permutation(nodes)
+    done = 0
+    while done < triples:
+        n = min(chunk, triples - done)
+        s = perm[rng.choice(nodes, n, p=node_p)]
+        o = perm[rng.choice(nodes, n, p=node_p)]
+        r = rng.choice(relations, n, p=rel_p)
+        yield [(node_name(a), f"relation_{c}", node_name(b)) for a, b, c in zip(s, o, r) if a != b]
+        done += n
+
+
+def to_csv_bytes(rows):
+    return "".join(f"{s},{r},{o}\n" for s, r, o in rows).encode()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--triples", type=int, default=100000)
+    ap.add_argument("--nodes", type=int, default=None, help="default: triples / 5")
+    ap.add_argument("--relations", type=int, default=50)
+    ap.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent of the degree distribution")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="-", help="CSV path, or - for stdout")
+    args = ap.parse_args()
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    with out:
+        for rows in generate(args.triples, args.nodes, args.relations, args.exponent, args.seed):
+            out.write(to_csv_bytes(rows))
+
+
+if __name__ == "__main__":
+    main()